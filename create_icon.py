@@ -3,138 +3,341 @@
 # Leon12097@163.com
 
 from PIL import Image, ImageDraw, ImageFont
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+import argparse
+import hashlib
 import os
 
+# Windows图标需要的尺寸
+ICO_SIZES = [(16, 16), (32, 32), (48, 48), (64, 64), (128, 128), (256, 256)]
+
+# 网站图标集合: 文件名 -> 尺寸
+FAVICON_PNGS = {
+    "favicon-16x16.png": (16, 16),
+    "favicon-32x32.png": (32, 32),
+    "apple-touch-icon.png": (180, 180),
+    "android-chrome-192x192.png": (192, 192),
+    "android-chrome-512x512.png": (512, 512),
+}
+FAVICON_ICO_SIZES = [(16, 16), (32, 32), (48, 48)]
+
+ICON_FORMATS = ("ico", "png", "favicon")
+SOURCE_EXTENSIONS = (".png", ".webp", ".jpg", ".jpeg", ".bmp", ".gif")
+
+# 内置图案的源名称
+DESIGN_SOURCE = "design"
+
+
+def draw_webp_converter_design(size):
+    """按指定边长绘制WebP转PNG转换器图案"""
+    width = height = size
+
+    # 创建透明背景
+    img = Image.new('RGBA', (width, height), (255, 255, 255, 0))
+    draw = ImageDraw.Draw(img)
+
+    # 计算内边距
+    padding = max(1, width // 16)
+
+    # 1. 绘制背景形状
+    bg_color = (66, 133, 244, 200)  # Google蓝色
+    draw.rounded_rectangle(
+        [padding, padding, width - padding, height - padding],
+        radius=width // 6,
+        fill=bg_color,
+        outline=(255, 255, 255, 255),
+        width=max(1, width // 32)
+    )
 
-def create_webp_converter_icon():
-    """创建WebP转PNG转换器图标"""
-
-    print("正在创建图标...")
-
-    # 定义多个尺寸（Windows需要这些尺寸）
-    sizes = [(16, 16), (32, 32), (48, 48), (64, 64), (128, 128), (256, 256)]
-    images = []
-
-    for width, height in sizes:
-        # 创建透明背景
-        img = Image.new('RGBA', (width, height), (255, 255, 255, 0))
-        draw = ImageDraw.Draw(img)
+    # 2. 绘制图标元素（只在足够大的尺寸上）
+    if width >= 32:
+        # 左边：WebP的"W"
+        webp_color = (255, 193, 7)  # 黄色/橙色
+        left_center_x = width // 3
+        center_y = height // 2
+
+        # 绘制WebP圆形背景
+        circle_radius = width // 6
+        draw.ellipse([
+            left_center_x - circle_radius,
+            center_y - circle_radius,
+            left_center_x + circle_radius,
+            center_y + circle_radius
+        ], fill=webp_color)
+
+        # 绘制"W"字母
+        if width >= 64:
+            try:
+                font_size = max(8, width // 6)
+                font = ImageFont.truetype("arial.ttf", font_size)
+                draw.text(
+                    (left_center_x, center_y - 2),
+                    "W",
+                    fill=(0, 0, 0, 255),
+                    font=font,
+                    anchor="mm"
+                )
+            except:
+                # 如果字体不可用，绘制简单的W
+                draw.text(
+                    (left_center_x - 3, center_y - 5),
+                    "W",
+                    fill=(0, 0, 0, 255)
+                )
+
+        # 右边：PNG的"P"
+        png_color = (76, 175, 80)  # 绿色
+        right_center_x = width * 2 // 3
+
+        # 绘制PNG圆形背景
+        draw.ellipse([
+            right_center_x - circle_radius,
+            center_y - circle_radius,
+            right_center_x + circle_radius,
+            center_y + circle_radius
+        ], fill=png_color)
+
+        # 绘制"P"字母
+        if width >= 64:
+            try:
+                draw.text(
+                    (right_center_x, center_y - 2),
+                    "P",
+                    fill=(255, 255, 255, 255),
+                    font=font,
+                    anchor="mm"
+                )
+            except:
+                draw.text(
+                    (right_center_x - 2, center_y - 5),
+                    "P",
+                    fill=(255, 255, 255, 255)
+                )
+
+        # 3. 绘制转换箭头
+        if width >= 48:
+            arrow_width = width // 12
+            arrow_x = width // 2
 
-        # 计算内边距
-        padding = max(1, width // 16)
-
-        # 1. 绘制背景形状
-        bg_color = (66, 133, 244, 200)  # Google蓝色
-        draw.rounded_rectangle(
-            [padding, padding, width - padding, height - padding],
-            radius=width // 6,
-            fill=bg_color,
-            outline=(255, 255, 255, 255),
-            width=max(1, width // 32)
+            # 绘制箭头
+            draw.polygon([
+                (arrow_x - arrow_width, center_y),
+                (arrow_x + arrow_width, center_y - arrow_width),
+                (arrow_x + arrow_width, center_y + arrow_width)
+            ], fill=(255, 255, 255, 255))
+
+    return img
+
+
+@lru_cache(maxsize=8)
+def _render_design(size):
+    """内置图案只绘制一次，按尺寸缓存"""
+    return draw_webp_converter_design(size)
+
+
+def load_icon_source(source, size):
+    """
+    载入图标源并生成最大尺寸的正方形母版
+    source为DESIGN_SOURCE时使用内置图案，否则视为图片路径（例如转换得到的PNG）
+    """
+    if source == DESIGN_SOURCE:
+        return _render_design(size).copy()
+
+    with Image.open(source) as img:
+        img = img.convert('RGBA')
+
+    # 保持宽高比，居中放到透明正方形画布上
+    side = max(img.size)
+    if img.size != (side, side):
+        canvas = Image.new('RGBA', (side, side), (255, 255, 255, 0))
+        canvas.paste(img, ((side - img.width) // 2, (side - img.height) // 2))
+        img = canvas
+
+    if side != size:
+        img = img.resize((size, size), Image.LANCZOS)
+    return img
+
+
+def build_size_chain(master, sizes):
+    """
+    由母版逐级缩小得到各个尺寸
+    每次最多缩小一半（LANCZOS），较小尺寸从已缓存的最接近的较大结果继续缩小，
+    避免一次性大倍率缩小造成的锯齿和细节丢失
+    """
+    cache = {master.size: master}
+
+    for target in sorted(set(sizes), key=lambda s: s[0], reverse=True):
+        if target in cache:
+            continue
+
+        # 从缓存中找到比目标大的最小图片作为起点
+        current = min(
+            (img for s, img in cache.items() if s[0] >= target[0] and s[1] >= target[1]),
+            key=lambda img: img.width
         )
-
-        # 2. 绘制图标元素（只在足够大的尺寸上）
-        if width >= 32:
-            # 左边：WebP的"W"
-            webp_color = (255, 193, 7)  # 黄色/橙色
-            left_center_x = width // 3
-            center_y = height // 2
-
-            # 绘制WebP圆形背景
-            circle_radius = width // 6
-            draw.ellipse([
-                left_center_x - circle_radius,
-                center_y - circle_radius,
-                left_center_x + circle_radius,
-                center_y + circle_radius
-            ], fill=webp_color)
-
-            # 绘制"W"字母
-            if width >= 64:
-                try:
-                    font_size = max(8, width // 6)
-                    font = ImageFont.truetype("arial.ttf", font_size)
-                    draw.text(
-                        (left_center_x, center_y - 2),
-                        "W",
-                        fill=(0, 0, 0, 255),
-                        font=font,
-                        anchor="mm"
-                    )
-                except:
-                    # 如果字体不可用，绘制简单的W
-                    draw.text(
-                        (left_center_x - 3, center_y - 5),
-                        "W",
-                        fill=(0, 0, 0, 255)
-                    )
-
-            # 右边：PNG的"P"
-            png_color = (76, 175, 80)  # 绿色
-            right_center_x = width * 2 // 3
-
-            # 绘制PNG圆形背景
-            draw.ellipse([
-                right_center_x - circle_radius,
-                center_y - circle_radius,
-                right_center_x + circle_radius,
-                center_y + circle_radius
-            ], fill=png_color)
-
-            # 绘制"P"字母
-            if width >= 64:
-                try:
-                    draw.text(
-                        (right_center_x, center_y - 2),
-                        "P",
-                        fill=(255, 255, 255, 255),
-                        font=font,
-                        anchor="mm"
-                    )
-                except:
-                    draw.text(
-                        (right_center_x - 2, center_y - 5),
-                        "P",
-                        fill=(255, 255, 255, 255)
-                    )
-
-            # 3. 绘制转换箭头
-            if width >= 48:
-                arrow_width = width // 12
-                arrow_x = width // 2
-
-                # 绘制箭头
-                draw.polygon([
-                    (arrow_x - arrow_width, center_y),
-                    (arrow_x + arrow_width, center_y - arrow_width),
-                    (arrow_x + arrow_width, center_y + arrow_width)
-                ], fill=(255, 255, 255, 255))
-
-        images.append(img)
-
-    # 保存为ICO文件
-    output_path = "webp_converter_icon.ico"
-    images[0].save(
-        output_path,
+        while current.width // 2 >= target[0] and current.height // 2 >= target[1]:
+            half = (current.width // 2, current.height // 2)
+            if half not in cache:
+                cache[half] = current.resize(half, Image.LANCZOS)
+            current = cache[half]
+
+        if current.size != target:
+            current = current.resize(target, Image.LANCZOS)
+        cache[target] = current
+
+    return cache
+
+
+def _save_ico(path, chain, sizes):
+    """按给定尺寸把缓存中的图片写入ICO文件"""
+    ordered = sorted(set(sizes), key=lambda s: s[0], reverse=True)
+    frames = [chain[s] for s in ordered]
+    # ICO编码器以第一张图为基准，因此最大尺寸放在最前
+    frames[0].save(
+        path,
         format='ICO',
-        sizes=[(img.width, img.height) for img in images],
+        sizes=ordered,
+        append_images=frames[1:],
         bitmap_format='bmp'
     )
 
-    print(f"✅ 图标已成功创建: {output_path}")
-    print(f"📁 文件大小: {os.path.getsize(output_path) // 1024} KB")
-    print(f"📐 包含尺寸: {', '.join([f'{w}x{h}' for w, h in sizes])}")
-
-    # 显示预览
-    print("\n🎨 图标预览:")
-    preview_size = min(256, max(sizes, key=lambda x: x[0])[0])
-    preview_img = next(img for w, h in sizes if w == preview_size)
-
-    # 简单的ASCII预览（对于256x256）
-    if preview_size >= 128:
-        print("(在文件管理器中查看实际效果)")
 
-    return output_path
+def create_icon_set(source, output_dir, sizes=None, formats=ICON_FORMATS, name=None):
+    """
+    为单个源生成图标集合（ICO、各尺寸PNG、网站favicon）
+    只在最大尺寸渲染一次，其余尺寸逐级缩小得到
+    返回生成的文件路径列表
+    """
+    sizes = list(sizes or ICO_SIZES)
+    formats = set(formats)
+
+    if name is None:
+        name = _default_icon_name(source)
+
+    needed = set()
+    if 'ico' in formats or 'png' in formats:
+        needed.update(sizes)
+    if 'favicon' in formats:
+        needed.update(FAVICON_PNGS.values())
+        needed.update(FAVICON_ICO_SIZES)
+    if not needed:
+        return []
+
+    master_size = max(s[0] for s in needed)
+    chain = build_size_chain(load_icon_source(source, master_size), needed)
+
+    os.makedirs(output_dir, exist_ok=True)
+    written = []
+
+    if 'ico' in formats:
+        ico_path = os.path.join(output_dir, f"{name}.ico")
+        _save_ico(ico_path, chain, sizes)
+        written.append(ico_path)
+
+    if 'png' in formats:
+        for width, height in sizes:
+            png_path = os.path.join(output_dir, f"{name}_{width}x{height}.png")
+            chain[(width, height)].save(png_path, format='PNG', optimize=True)
+            written.append(png_path)
+
+    if 'favicon' in formats:
+        favicon_dir = os.path.join(output_dir, f"{name}_favicon")
+        os.makedirs(favicon_dir, exist_ok=True)
+        favicon_path = os.path.join(favicon_dir, "favicon.ico")
+        _save_ico(favicon_path, chain, FAVICON_ICO_SIZES)
+        written.append(favicon_path)
+        for filename, size in FAVICON_PNGS.items():
+            png_path = os.path.join(favicon_dir, filename)
+            chain[size].save(png_path, format='PNG', optimize=True)
+            written.append(png_path)
+
+    return written
+
+
+def collect_icon_sources(paths):
+    """展开输入路径：文件夹中的图片全部作为图标源"""
+    sources = []
+    for path in paths:
+        if path == DESIGN_SOURCE:
+            sources.append(path)
+        elif os.path.isdir(path):
+            for filename in sorted(os.listdir(path)):
+                if filename.lower().endswith(SOURCE_EXTENSIONS):
+                    sources.append(os.path.join(path, filename))
+        else:
+            sources.append(path)
+    return sources
+
+
+def _default_icon_name(source):
+    if source == DESIGN_SOURCE:
+        return "webp_converter_icon"
+    return os.path.splitext(os.path.basename(source))[0]
+
+
+def icon_set_names(sources):
+    """
+    为每个源确定输出文件名前缀，保证互不相同
+    同名不同扩展名（a.png / a.webp）时加上扩展名，仍重名（不同文件夹中的同名文件）时再加上路径摘要
+    """
+    names = {}
+    groups = {}
+    for source in dict.fromkeys(sources):
+        groups.setdefault(_default_icon_name(source).lower(), []).append(source)
+
+    for group in groups.values():
+        if len(group) == 1:
+            names[group[0]] = _default_icon_name(group[0])
+            continue
+        with_ext = {}
+        for source in group:
+            stem, ext = os.path.splitext(os.path.basename(source))
+            with_ext.setdefault(f"{stem}_{ext.lstrip('.')}".lower(), []).append(source)
+        for clashing in with_ext.values():
+            for source in clashing:
+                stem, ext = os.path.splitext(os.path.basename(source))
+                name = f"{stem}_{ext.lstrip('.')}"
+                if len(clashing) > 1:
+                    digest = hashlib.sha1(os.path.abspath(source).encode('utf-8')).hexdigest()
+                    name = f"{name}_{digest[:8]}"
+                names[source] = name
+
+    # 加上扩展名后仍可能与其他源的默认名称相同（如 a_png.png），此时一律加上路径摘要
+    counts = {}
+    for name in names.values():
+        counts[name.lower()] = counts.get(name.lower(), 0) + 1
+    for source, name in names.items():
+        if counts[name.lower()] > 1:
+            digest = hashlib.sha1(os.path.abspath(source).encode('utf-8')).hexdigest()
+            names[source] = f"{name}_{digest[:8]}"
+    return names
+
+
+def batch_create_icons(sources, output_dir, sizes=None, formats=ICON_FORMATS, workers=None):
+    """
+    并行为多个源生成图标集合
+    Pillow在缩放和编码时会释放GIL，线程池即可充分利用多核
+    输出文件名由 icon_set_names 确定，重名的源不会互相覆盖
+    返回 {源: 文件列表或异常}
+    """
+    results = {}
+    workers = workers or min(32, (os.cpu_count() or 1) + 4)
+    names = icon_set_names(sources)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(create_icon_set, source, output_dir, sizes, formats, name): source
+            for source, name in names.items()
+        }
+        for future in as_completed(futures):
+            source = futures[future]
+            try:
+                results[source] = future.result()
+            except Exception as e:
+                results[source] = e
+
+    return results
 
 
 def create_simple_icon():
@@ -186,34 +389,60 @@ def create_simple_icon():
     return output_path
 
 
-if __name__ == "__main__":
-    print("=" * 50)
-    print("      WebP转PNG转换器图标生成器")
-    print("=" * 50)
-
-    try:
-        # 检查PIL是否安装
-        from PIL import Image, ImageDraw
-
-        print("\n请选择图标风格:")
-        print("1. 精美风格图标 (推荐)")
-        print("2. 简化风格图标")
+def parse_sizes(text):
+    """解析尺寸列表，例如 "16,32,48" """
+    return [(int(s), int(s)) for s in text.split(',') if s.strip()]
 
-        choice = input("请输入选择 (1 或 2): ").strip()
 
-        if choice == "1":
-            icon_file = create_webp_converter_icon()
+def main(argv=None):
+    """命令行入口（非交互）"""
+    parser = argparse.ArgumentParser(description="WebP转PNG转换器图标生成器")
+    parser.add_argument(
+        "sources", nargs="*", default=[DESIGN_SOURCE],
+        help=f"图标源：图片文件、图片文件夹或 '{DESIGN_SOURCE}'（内置图案，默认）"
+    )
+    parser.add_argument("-o", "--output", default=".", help="输出文件夹（默认当前目录）")
+    parser.add_argument(
+        "-f", "--formats", default="ico",
+        help=f"输出格式，逗号分隔: {', '.join(ICON_FORMATS)}（默认 ico）"
+    )
+    parser.add_argument(
+        "-s", "--sizes", type=parse_sizes, default=ICO_SIZES,
+        help="ICO/PNG尺寸，逗号分隔（默认 16,32,48,64,128,256）"
+    )
+    parser.add_argument("-j", "--workers", type=int, default=None, help="并行线程数")
+    parser.add_argument("--simple", action="store_true", help="生成简化风格图标")
+    args = parser.parse_args(argv)
+
+    if args.simple:
+        create_simple_icon()
+        return 0
+
+    formats = [f.strip() for f in args.formats.split(',') if f.strip()]
+    unknown = set(formats) - set(ICON_FORMATS)
+    if unknown:
+        parser.error(f"未知的输出格式: {', '.join(sorted(unknown))}")
+
+    sources = collect_icon_sources(args.sources)
+    if not sources:
+        print("❌ 未找到任何图标源")
+        return 1
+
+    print(f"正在为 {len(sources)} 个源生成图标...")
+    results = batch_create_icons(sources, args.output, args.sizes, formats, args.workers)
+
+    error_count = 0
+    for source in sources:
+        result = results[source]
+        if isinstance(result, Exception):
+            print(f"❌ 生成失败 {source}: {result}")
+            error_count += 1
         else:
-            icon_file = create_simple_icon()
+            print(f"✅ {source}: {len(result)} 个文件")
 
-        print(f"\n🎯 使用说明:")
-        print(f"1. 在 Auto-Py-To-Exe 中，点击 'Icon (optional)' 的 'Browse...'")
-        print(f"2. 选择: {icon_file}")
-        print(f"3. 继续打包，exe文件就会显示这个图标")
+    print(f"📁 图标保存在: {os.path.abspath(args.output)}")
+    return 1 if error_count else 0
 
-        input("\n按回车键退出...")
 
-    except ImportError:
-        print("❌ 需要安装Pillow库，请运行:")
-        print("   pip install Pillow")
-        input("\n按回车键退出...")
\ No newline at end of file
+if __name__ == "__main__":
+    raise SystemExit(main())
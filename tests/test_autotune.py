@@ -0,0 +1,19 @@
+"""自动调优：并发配置的选择"""
+from webp_autotune import choose_config
+
+
+def config(workers, backend, files_per_second, peak_rss, rss_measured=True):
+    return {'workers': workers, 'backend': backend, 'files_per_second': files_per_second,
+            'peak_rss': peak_rss, 'rss_measured': rss_measured, 'failed': 0}
+
+
+def test_balanced_prefers_lower_memory_among_near_fastest():
+    results = [config(4, "process", 100.0, 900), config(4, "thread", 95.0, 300),
+               config(1, "thread", 30.0, 100)]
+    assert choose_config(results, "balanced")['backend'] == "thread"
+    assert choose_config(results, "fastest")['backend'] == "process"
+
+
+def test_unmeasured_memory_falls_back_to_throughput():
+    results = [config(4, "process", 100.0, 900, False), config(4, "thread", 95.0, 300, False)]
+    assert choose_config(results, "smallest")['backend'] == "process"
@@ -0,0 +1,83 @@
+"""集群模式：多个节点同时转换同一个文件夹时，每个输出只写入一次"""
+import collections
+import glob
+import io
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+from PIL import Image
+
+from webp_cluster import ClusterCoordinator
+from webp_prefetch import write_file
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      "webp_to_png_converter.py")
+
+NODE_COUNT = 4
+FILE_COUNT = 80
+
+
+def make_webp_files(folder, count):
+    names = []
+    for i in range(count):
+        name = f"img{i:03d}.webp"
+        Image.new('RGBA', (48, 32), (i % 256, 80, 160, 200)).save(os.path.join(folder, name))
+        names.append(name)
+    return names
+
+
+def test_nodes_write_each_output_exactly_once(tmp_path):
+    names = make_webp_files(str(tmp_path), FILE_COUNT)
+    # mirror 布局下每个节点把自己写入的输出记录到各自的索引文件中
+    command = [sys.executable, SCRIPT, str(tmp_path), "--cluster", "--layout", "mirror",
+               "--batch-count", "16", "-j", "2"]
+    nodes = [subprocess.Popen(command + ["--node-id", f"node{i}"],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+             for i in range(NODE_COUNT)]
+    for node in nodes:
+        _, stderr = node.communicate(timeout=120)
+        assert node.returncode == 0, stderr.decode(errors='replace')
+
+    written = collections.Counter()
+    for index_path in glob.glob(str(tmp_path / "*" / "output_index.*.tsv")):
+        with open(index_path, encoding='utf-8') as f:
+            for line in f:
+                written[line.split('\t')[0]] += 1
+
+    assert sorted(written) == sorted(names)
+    assert set(written.values()) == {1}
+    output_folder = os.path.dirname(index_path)
+    for name in names:
+        with Image.open(os.path.join(output_folder, name[:-len('.webp')] + '.png')) as img:
+            assert img.size == (48, 32)
+    assert not glob.glob(os.path.join(output_folder, "*.part"))
+
+
+def test_taken_over_batch_does_not_commit(tmp_path):
+    state_dir = str(tmp_path / ".cluster")
+    files = ["a.webp"]
+    with ClusterCoordinator(state_dir, node_id="old", lease_timeout=60) as old, \
+            ClusterCoordinator(state_dir, node_id="new", lease_timeout=60) as new:
+        batch = old.try_claim(0, files)
+        assert batch is not None and batch.still_held()
+
+        # 旧持有者停止续租，租约过期后被新节点接管
+        stale = time.time() - 120
+        os.utime(batch.lease_path, (stale, stale))
+        takeover = new.try_claim(0, files)
+        assert takeover is not None and takeover.generation == batch.generation + 1
+
+        output_path = str(tmp_path / "a.png")
+        with pytest.raises(InterruptedError):
+            write_file(output_path, io.BytesIO(b"late"), before_commit=batch.still_held)
+        assert batch.lost
+        assert not os.path.exists(output_path)
+        assert not glob.glob(str(tmp_path / "*.part"))
+
+        # 新持有者照常写入
+        write_file(output_path, io.BytesIO(b"png"), before_commit=takeover.still_held)
+        with open(output_path, 'rb') as f:
+            assert f.read() == b"png"
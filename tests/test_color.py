@@ -0,0 +1,61 @@
+"""色彩管理：sRGB转换、配置文件损坏时保留原样、转换缓存"""
+import io
+
+import pytest
+from PIL import Image
+
+from webp_color import apply_color_management, get_srgb_transform, transform_cache_info
+
+ImageCms = pytest.importorskip("PIL.ImageCms")
+
+
+def srgb_profile_bytes():
+    return ImageCms.ImageCmsProfile(ImageCms.createProfile('sRGB')).tobytes()
+
+
+def other_profile_bytes():
+    """与sRGB相同的RGB配置文件，但描述不同，不会被当作sRGB跳过"""
+    return srgb_profile_bytes().replace(b'\x00s\x00R\x00G\x00B', b'\x00w\x00R\x00G\x00B')
+
+
+def webp_with_profile(icc_profile):
+    buffer = io.BytesIO()
+    Image.new('RGB', (16, 16), (200, 100, 50)).save(buffer, format='WEBP', lossless=True,
+                                                    icc_profile=icc_profile)
+    buffer.seek(0)
+    return Image.open(buffer)
+
+
+def test_corrupt_profile_is_kept_as_is():
+    img = webp_with_profile(b'not an icc profile' * 8)
+    result, metadata = apply_color_management(img, {'color_mode': 'srgb'})
+    assert result is img
+    assert metadata['icc_profile'] == b'not an icc profile' * 8
+
+
+def test_srgb_profile_skips_transform():
+    img = webp_with_profile(srgb_profile_bytes())
+    result, metadata = apply_color_management(img, {'color_mode': 'srgb'})
+    assert result is img
+    assert 'icc_profile' not in metadata
+
+
+def test_keep_mode_preserves_profile():
+    img = webp_with_profile(other_profile_bytes())
+    result, metadata = apply_color_management(img, {'color_mode': 'keep'})
+    assert result is img
+    assert metadata['icc_profile'] == other_profile_bytes()
+
+
+def test_transform_is_built_once_per_profile():
+    get_srgb_transform.cache_clear()
+    profile = other_profile_bytes()
+    for _ in range(3):
+        img = webp_with_profile(profile)
+        result, metadata = apply_color_management(img, {'color_mode': 'srgb'})
+        assert result is not img
+        assert result.mode == 'RGB' and result.size == img.size
+        assert 'icc_profile' not in metadata
+    info = transform_cache_info()
+    assert info.misses == 1
+    assert info.hits == 2
@@ -0,0 +1,46 @@
+"""转换池：进程池的子进程意外退出后，任务逐个失败而不是中断整个转换"""
+import os
+from concurrent.futures import BrokenExecutor
+
+import pytest
+from PIL import Image
+
+from webp_converter_core import ConversionPool, run_conversion
+
+
+def make_jobs(folder, count):
+    jobs = []
+    for i in range(count):
+        path = os.path.join(folder, f"img{i}.webp")
+        Image.new('RGB', (40, 30), (i * 20, 90, 30)).save(path)
+        jobs.append((path, os.path.join(folder, f"img{i}.png")))
+    return jobs
+
+
+def test_broken_process_pool_fails_jobs_and_releases_budget(tmp_path):
+    jobs = make_jobs(str(tmp_path), 3)
+    pool = ConversionPool(workers=2, backend="process")
+    try:
+        # 模拟子进程被系统结束（例如内存不足）
+        with pytest.raises(BrokenExecutor):
+            pool.executor.submit(os._exit, 1).result()
+
+        results = list(run_conversion(jobs, {}, pool=pool))
+
+        assert len(results) == len(jobs)
+        assert not any(result['success'] for result in results)
+        assert all("转换进程意外退出" in result['message'] for result in results)
+        assert pool.admission.in_use == 0
+        assert pool.admission.held == 0
+        assert pool.broken
+        assert not pool.matches({'workers': 2, 'backend': "process"})
+    finally:
+        pool.shutdown()
+
+    # 重新创建的池照常工作
+    pool = ConversionPool(workers=2, backend="process")
+    try:
+        results = list(run_conversion(jobs, {}, pool=pool))
+        assert all(result['success'] for result in results)
+    finally:
+        pool.shutdown()
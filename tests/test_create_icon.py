@@ -0,0 +1,64 @@
+"""图标生成：逐级缩小的尺寸链和批量生成时的文件名"""
+import os
+
+from PIL import Image
+
+from create_icon import (build_size_chain, icon_set_names, create_icon_set, DESIGN_SOURCE,
+                         ICO_SIZES)
+
+
+def test_size_chain_contains_every_size():
+    master = Image.new('RGBA', (512, 512), (255, 152, 0, 255))
+    sizes = ICO_SIZES + [(180, 180), (20, 20)]
+
+    chain = build_size_chain(master, sizes)
+
+    for size in sizes:
+        assert chain[size].size == size
+    # 中间的减半结果也被缓存，母版保持不变
+    assert chain[(512, 512)] is master
+    assert (128, 128) in chain
+
+
+def test_size_chain_keeps_content():
+    master = Image.new('RGBA', (256, 256), (33, 150, 243, 255))
+
+    chain = build_size_chain(master, [(16, 16)])
+
+    assert chain[(16, 16)].getpixel((8, 8)) == (33, 150, 243, 255)
+
+
+def test_unique_names_keep_default():
+    sources = [DESIGN_SOURCE, os.path.join("icons", "logo.png")]
+
+    assert icon_set_names(sources) == {DESIGN_SOURCE: "webp_converter_icon",
+                                       sources[1]: "logo"}
+
+
+def test_same_stem_different_extension():
+    sources = [os.path.join("icons", "a.png"), os.path.join("icons", "a.webp")]
+
+    assert icon_set_names(sources) == {sources[0]: "a_png", sources[1]: "a_webp"}
+
+
+def test_same_name_in_different_folders():
+    sources = [os.path.join("x", "a.png"), os.path.join("y", "a.png"),
+               os.path.join("y", "a_png.png")]
+
+    names = icon_set_names(sources)
+
+    assert len(set(name.lower() for name in names.values())) == len(sources)
+    assert names[sources[0]].startswith("a_png_")
+    assert names[sources[1]].startswith("a_png_")
+    assert names[sources[2]] == "a_png"
+
+
+def test_icon_set_files(tmp_path):
+    written = create_icon_set(DESIGN_SOURCE, str(tmp_path), sizes=[(16, 16), (32, 32)],
+                              formats=("ico", "png"))
+
+    names = sorted(os.path.basename(path) for path in written)
+    assert names == ["webp_converter_icon.ico", "webp_converter_icon_16x16.png",
+                     "webp_converter_icon_32x32.png"]
+    with Image.open(os.path.join(str(tmp_path), "webp_converter_icon.ico")) as ico:
+        assert set(ico.info['sizes']) == {(16, 16), (32, 32)}
@@ -0,0 +1,84 @@
+"""输出布局：默认保留原文件名，只有真正重名的源加摘要；日期布局按索引找到输出"""
+import os
+import sys
+import time
+
+import pytest
+
+from webp_layout import OutputLayout, OutputIndex
+
+
+def touch(folder, relative_source, mtime=None):
+    path = os.path.join(folder, relative_source)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb'):
+        pass
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def planned(layout, sources):
+    layout.plan(sources)
+    return {source: layout.relative_output(source).replace(os.sep, '/') for source in sources}
+
+
+def test_flat_keeps_root_names_whatever_the_extension_case(tmp_path):
+    layout = OutputLayout(str(tmp_path), str(tmp_path / "out"))
+    assert planned(layout, ["Photo.WEBP", "b.webp"]) == {"Photo.WEBP": "Photo.png",
+                                                          "b.webp": "b.png"}
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="Windows 文件名不区分大小写")
+def test_names_differing_only_in_case_do_not_collide(tmp_path):
+    layout = OutputLayout(str(tmp_path), str(tmp_path / "out"))
+    assert planned(layout, ["A.webp", "a.webp"]) == {"A.webp": "A.png", "a.webp": "a.png"}
+    assert layout.output_path("A.webp") != layout.output_path("a.webp")
+
+
+def test_only_colliding_sources_get_a_digest(tmp_path):
+    layout = OutputLayout(str(tmp_path), str(tmp_path / "out"))
+    outputs = planned(layout, [os.path.join("y", "a.webp"), os.path.join("x", "a.webp"),
+                               "a.webp", os.path.join("x", "b.webp")])
+    assert outputs["a.webp"] == "a.png"
+    assert outputs[os.path.join("x", "b.webp")] == "b.png"
+    renamed = [outputs[os.path.join(d, "a.webp")] for d in ("x", "y")]
+    assert all(name.startswith("a_") and name.endswith(".png") for name in renamed)
+    assert len(set(outputs.values())) == len(outputs)
+
+
+def test_plan_is_independent_of_listing_order(tmp_path):
+    sources = [os.path.join("x", "a.webp"), os.path.join("y", "a.webp"), "a.WEBP", "a.webp"]
+    first = planned(OutputLayout(str(tmp_path), str(tmp_path / "out")), sources)
+    second = planned(OutputLayout(str(tmp_path), str(tmp_path / "out")), sources[::-1])
+    assert first == second
+    assert len(set(first.values())) == len(sources)
+
+
+def test_mirror_keeps_directories(tmp_path):
+    layout = OutputLayout(str(tmp_path), str(tmp_path / "out"), "mirror")
+    outputs = planned(layout, [os.path.join("x", "a.webp"), os.path.join("y", "a.webp")])
+    assert sorted(outputs.values()) == ["x/a.png", "y/a.png"]
+
+
+def test_unplanned_collision_is_rejected(tmp_path):
+    layout = OutputLayout(str(tmp_path), str(tmp_path / "out"))
+    layout.output_path(os.path.join("x", "a.webp"))
+    with pytest.raises(ValueError):
+        layout.output_path(os.path.join("y", "a.webp"))
+
+
+def test_date_layout_finds_output_after_source_is_touched(tmp_path):
+    input_folder, output_folder = str(tmp_path), str(tmp_path / "out")
+    touch(input_folder, "a.webp", mtime=time.mktime((2020, 1, 2, 12, 0, 0, 0, 0, -1)))
+    layout = OutputLayout(input_folder, output_folder, "date")
+    layout.plan(["a.webp"])
+    output_path = layout.output_path("a.webp")
+    assert layout.relative_output("a.webp").replace(os.sep, '/') == "2020/01/02/a.png"
+    with OutputIndex(output_folder) as index:
+        index.add("a.webp", os.path.relpath(output_path, output_folder))
+
+    # 转换后修改了源文件：按当前修改时间计算的路径已不同，校验仍应找到原输出
+    touch(input_folder, "a.webp")
+    layout = OutputLayout(input_folder, output_folder, "date")
+    layout.plan(["a.webp"])
+    assert layout.existing_output("a.webp") == output_path
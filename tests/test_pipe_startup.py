@@ -0,0 +1,27 @@
+"""管道模式启动时不加载集群、指标、布局、校验和自动调优模块"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = """
+import sys
+sys.argv = ['webp_to_png_converter.py', '--pipe', '-0']
+sys.stdin = open(__import__('os').devnull)
+import webp_to_png_converter
+try:
+    webp_to_png_converter.main()
+except SystemExit:
+    pass
+print(' '.join(sorted(name for name in sys.modules if name.startswith('webp_'))))
+"""
+
+
+def test_pipe_mode_skips_batch_only_modules():
+    output = subprocess.run([sys.executable, "-c", SCRIPT], cwd=ROOT, capture_output=True,
+                            text=True, check=True).stdout
+    loaded = set(output.split())
+    assert 'webp_pipe' in loaded
+    assert not loaded & {'webp_cluster', 'webp_metrics', 'webp_layout', 'webp_verify',
+                         'webp_autotune'}
@@ -0,0 +1,39 @@
+"""缩略图磁盘缓存：超出预算时按最近使用淘汰"""
+import os
+
+import pytest
+from PIL import Image
+
+pytest.importorskip("PyQt5")
+
+from webp_file_table import ThumbnailCache
+
+
+def fill(cache, keys):
+    for i, key in enumerate(keys):
+        thumbnail = Image.effect_noise((48, 48), 64 + i).convert('RGB')
+        cache.save_disk(key, thumbnail, (480, 480))
+        path = cache._disk_path(key)
+        # 文件修改时间按写入顺序递增
+        os.utime(path, ns=(i * 10**9, i * 10**9))
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    keys = [f"{i:02x}" + "0" * 38 for i in range(6)]
+    cache = ThumbnailCache(cache_dir=str(tmp_path))
+    fill(cache, keys)
+    entry_size = os.path.getsize(cache._disk_path(keys[0]))
+
+    # 命中的缓存项变为最近使用
+    assert cache.load_disk(keys[0]) is not None
+
+    # 新的缓存只放得下约4项
+    cache = ThumbnailCache(cache_dir=str(tmp_path), disk_budget=entry_size * 4.5)
+    cache.save_disk("ff" + "0" * 38, Image.new('RGB', (48, 48)), (480, 480))
+
+    remaining = {key for key in keys if os.path.exists(cache._disk_path(key))}
+    total = sum(size for _, size, _ in cache._disk_entries())
+    assert total <= entry_size * 4.5
+    assert keys[0] in remaining
+    assert keys[1] not in remaining
+    assert os.path.exists(cache._disk_path("ff" + "0" * 38))
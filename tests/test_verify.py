@@ -0,0 +1,98 @@
+"""输出校验：像素不一致、输出损坏、校验清单缓存，以及同时校验受内存预算限制"""
+import os
+import threading
+import time
+
+from PIL import Image
+
+import webp_verify
+from webp_verify import (verify_outputs, STATUS_OK, STATUS_MISMATCH, STATUS_CORRUPT,
+                         MANIFEST_FILE_NAME)
+
+
+def make_pair(folder, name, size=(40, 30), color=(200, 90, 30)):
+    source = os.path.join(folder, f"{name}.webp")
+    output = os.path.join(folder, f"{name}.png")
+    image = Image.new('RGB', size, color)
+    image.save(source, lossless=True)
+    image.save(output)
+    return source, output
+
+
+def statuses(pairs, folder, options=None):
+    return {result['input_path']: (result['status'], result['cached'])
+            for result in verify_outputs(pairs, options or {}, folder)}
+
+
+def test_pixel_mismatch(tmp_path):
+    source, output = make_pair(str(tmp_path), "a")
+    Image.new('RGB', (40, 30), (0, 0, 0)).save(output)
+
+    assert statuses([(source, output)], str(tmp_path)) == {source: (STATUS_MISMATCH, False)}
+
+
+def test_size_mismatch(tmp_path):
+    source, output = make_pair(str(tmp_path), "a")
+    Image.new('RGB', (20, 30), (200, 90, 30)).save(output)
+
+    assert statuses([(source, output)], str(tmp_path)) == {source: (STATUS_MISMATCH, False)}
+
+
+def test_truncated_output_is_corrupt(tmp_path):
+    source, output = make_pair(str(tmp_path), "a", size=(200, 200))
+    with open(output, 'rb') as f:
+        data = f.read()
+    with open(output, 'wb') as f:
+        f.write(data[:len(data) // 2])
+
+    assert statuses([(source, output)], str(tmp_path)) == {source: (STATUS_CORRUPT, False)}
+
+
+def test_manifest_caches_until_output_changes(tmp_path):
+    folder = str(tmp_path)
+    source, output = make_pair(folder, "a")
+
+    assert statuses([(source, output)], folder) == {source: (STATUS_OK, False)}
+    assert os.path.exists(os.path.join(folder, MANIFEST_FILE_NAME))
+    assert statuses([(source, output)], folder) == {source: (STATUS_OK, True)}
+
+    # 输出变化后签名不同，重新校验
+    Image.new('RGB', (40, 30), (0, 0, 0)).save(output)
+    assert statuses([(source, output)], folder) == {source: (STATUS_MISMATCH, False)}
+    # 不一致的结果不会被当作已校验
+    assert statuses([(source, output)], folder) == {source: (STATUS_MISMATCH, False)}
+
+
+def test_concurrent_checks_stay_within_memory_budget(tmp_path, monkeypatch):
+    folder = str(tmp_path)
+    pairs = [make_pair(folder, f"img{i}", size=(400, 400)) for i in range(6)]
+    lock = threading.Lock()
+    active = [0]
+    peak = [0]
+    verify_pair = webp_verify.verify_pair
+
+    def tracked(input_path, output_path, options):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        try:
+            return verify_pair(input_path, output_path, options)
+        finally:
+            with lock:
+                active[0] -= 1
+
+    monkeypatch.setattr(webp_verify, 'verify_pair', tracked)
+
+    # 每对约 400×400×4×6 字节，1MB 预算每次只放得下一个（超出预算的单个任务仍会放行）
+    options = {'verify_workers': 4, 'memory_budget_mb': 1}
+    results = statuses(pairs, folder, options)
+    assert len(results) == len(pairs)
+    assert all(status == STATUS_OK for status, _ in results.values())
+    assert peak[0] == 1
+
+    # 预算充足时按线程数并行
+    os.remove(os.path.join(folder, MANIFEST_FILE_NAME))
+    peak[0] = 0
+    statuses(pairs, folder, {'verify_workers': 4, 'memory_budget_mb': 1024})
+    assert peak[0] > 1
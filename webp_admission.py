@@ -0,0 +1,215 @@
+"""
+并发解码的内存准入控制
+根据图片头中的尺寸和模式估算每个任务的峰值内存，只有在不超出内存预算时才开始执行，
+使多个大图同时到达时不会把进程内存撑爆；
+排队等待准入的任务已经读入内存的源文件也计入预算
+"""
+import os
+import sys
+import threading
+
+MB = 1024 * 1024
+
+# 默认内存预算（MB）
+DEFAULT_MEMORY_BUDGET_MB = 2048
+
+# 各模式每像素字节数（Pillow内部存储）
+_BYTES_PER_PIXEL = {
+    '1': 1, 'L': 1, 'P': 1, 'LA': 4, 'La': 4, 'PA': 4,
+    'RGB': 4, 'RGBA': 4, 'RGBa': 4, 'CMYK': 4, 'YCbCr': 4, 'I': 4, 'F': 4,
+}
+
+# 被跳过多少次后，后续任务让路给该任务
+_MAX_BYPASS = 16
+
+
+def estimate_peak_memory(width, height, mode, input_size=0, options=None):
+    """
+    估算转换单张图片的峰值内存（字节）
+    解码后的图像 + 透明通道处理 / 色彩转换产生的副本 + 编码输出缓冲 + 输入数据
+    """
+    options = options or {}
+    pixels = width * height
+    decoded = pixels * _BYTES_PER_PIXEL.get(mode, 4)
+    peak = decoded
+
+    if options.get('flatten_alpha', False):
+        if mode == 'RGBA':
+            # 白色背景RGB图 + split() 同时拆出的4个通道（每个通道每像素1字节）
+            peak += pixels * 4 + pixels * 4
+        elif mode in ('LA', 'P', 'CMYK'):
+            # 转换得到的RGB副本
+            peak += pixels * 4
+    if options.get('color_mode') == 'srgb':
+        # ICC转换得到的副本
+        peak += pixels * 4
+    # PNG输出最坏情况接近未压缩大小
+    peak += decoded
+    return peak + input_size
+
+
+class MemoryAdmission:
+    """
+    内存预算准入
+    try_acquire 非阻塞：放得下就占用并返回True。
+    超出整个预算的单个任务只在没有其他任务运行时放行，保证总能继续推进
+    hold 无条件计入排队任务已占用的内存（如预读的源文件），放行时转为任务占用的一部分
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.in_use = 0
+        self.held = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def fits(self, cost, held=0):
+        # in_use 中只剩排队任务的占用时，表示没有任务在运行
+        return self.in_use == self.held or self.in_use - held + cost <= self.budget
+
+    def try_acquire(self, cost, held=0):
+        """held 为该任务此前通过 hold 计入的字节数（已包含在 cost 中）"""
+        with self._lock:
+            if not self.fits(cost, held):
+                return False
+            self.in_use += cost - held
+            self.held -= held
+            self.peak = max(self.peak, self.in_use)
+            return True
+
+    def release(self, cost):
+        with self._lock:
+            self.in_use -= cost
+
+    def hold(self, nbytes):
+        with self._lock:
+            self.in_use += nbytes
+            self.held += nbytes
+            self.peak = max(self.peak, self.in_use)
+
+    def release_held(self, nbytes):
+        with self._lock:
+            self.in_use -= nbytes
+            self.held -= nbytes
+
+
+class AdmissionQueue:
+    """
+    等待准入的任务队列
+    按到达顺序尝试启动任务，放不下的大任务不会阻塞后面的小任务；
+    但一个任务被越过太多次后，后续任务不再越过它，避免大图饿死
+    """
+
+    def __init__(self, admission):
+        self.admission = admission
+        self._waiting = []  # [cost, 被越过次数, 任务, 排队期间占用的字节数]
+
+    def __len__(self):
+        return len(self._waiting)
+
+    def add(self, cost, job, held=0):
+        """held 为任务排队期间已经占用的内存（如预读的源文件），立即计入预算"""
+        self.admission.hold(held)
+        self._waiting.append([cost, 0, job, held])
+
+    def pop_all(self):
+        """取出全部等待中的任务（停止时丢弃用），归还其排队期间的占用"""
+        entries, self._waiting = self._waiting, []
+        for _, _, _, held in entries:
+            self.admission.release_held(held)
+        return [(cost, job) for cost, _, job, _ in entries]
+
+    def pop_admitted(self, limit):
+        """取出最多 limit 个可以立即开始的任务，返回 [(cost, job)]"""
+        started = []
+        blocked = False
+        remaining = []
+        for entry in self._waiting:
+            cost, bypassed, job, held = entry
+            if len(started) < limit and not blocked and self.admission.try_acquire(cost, held):
+                started.append((cost, job))
+                continue
+            if len(started) < limit and not blocked:
+                entry[1] = bypassed + 1
+                if entry[1] > _MAX_BYPASS:
+                    # 为这个任务预留内存，后续任务等待
+                    blocked = True
+            remaining.append(entry)
+        self._waiting = remaining
+        return started
+
+
+def peak_rss():
+    """
+    当前进程的峰值常驻内存（字节），无法获取时返回None
+    Linux 读取 VmHWM（可被 reset_peak_rss 重置），其他平台依次尝试 resource 和 psutil
+    """
+    if sys.platform.startswith('linux'):
+        try:
+            with open('/proc/self/status', encoding='ascii') as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+
+    try:
+        import resource
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 单位为字节，其他为KB
+        return usage if sys.platform == 'darwin' else usage * 1024
+    except ImportError:
+        pass
+
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss)
+    except ImportError:
+        return None
+
+
+class WorkerPeakRss:
+    """
+    进程池各转换进程的峰值常驻内存
+    由转换结果中的 worker_pid / worker_peak_rss 汇总：按进程号取最大值后相加（线程池时为0）
+    """
+
+    def __init__(self):
+        self._peaks = {}
+        self._lock = threading.Lock()
+
+    def add(self, result):
+        pid = result.get('worker_pid')
+        if pid is None:
+            return
+        with self._lock:
+            self._peaks[pid] = max(self._peaks.get(pid, 0), result.get('worker_peak_rss') or 0)
+
+    def total(self):
+        with self._lock:
+            return sum(self._peaks.values())
+
+
+def total_peak_rss(worker_rss=None):
+    """本进程与各转换进程的峰值常驻内存之和（字节），都无法获取时返回None"""
+    rss = peak_rss()
+    workers = worker_rss.total() if worker_rss is not None else 0
+    if rss is None and not workers:
+        return None
+    return (rss or 0) + workers
+
+
+def reset_peak_rss():
+    """重置峰值内存统计（仅Linux支持），使每次运行分别统计"""
+    try:
+        with open('/proc/self/clear_refs', 'w', encoding='ascii') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def default_workers():
+    """默认并发转换线程数"""
+    return os.cpu_count() or 1
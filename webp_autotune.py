@@ -0,0 +1,277 @@
+"""
+自动调优
+在输入文件夹的一个样本上做短时间校准，按目标（最快 / 最小 / 均衡）选出：
+- PNG编码设置（compress_level / optimize；optimize 开启时Pillow固定使用最高压缩级别）
+- 转换线程数，以及线程池还是进程池
+结果按 主机 + 文件夹 保存，之后的运行直接沿用；CPU核心数变化后的配置不会被沿用
+"""
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+from webp_converter_core import process_image, encode_png, run_conversion, BACKEND_NAMES
+from webp_admission import WorkerPeakRss, total_peak_rss, reset_peak_rss, default_workers
+
+OBJECTIVES = ("fastest", "smallest", "balanced")
+OBJECTIVE_NAMES = {
+    "fastest": "最快",
+    "smallest": "最小",
+    "balanced": "均衡",
+}
+
+# 校准使用的样本文件数
+DEFAULT_SAMPLE_SIZE = 24
+
+# 候选编码设置
+ENCODER_CANDIDATES = (
+    {'optimize': False, 'compress_level': 1},
+    {'optimize': False, 'compress_level': 3},
+    {'optimize': False, 'compress_level': 6},
+    {'optimize': True, 'compress_level': 9},
+)
+
+# 吞吐量不低于最佳值的该比例时，视为同样快，优先选内存占用低的配置
+THROUGHPUT_TOLERANCE = 0.9
+
+PROFILE_FILE_NAME = "autotune_profiles.json"
+
+
+def profile_path():
+    """调优配置文件的位置（用户配置目录）"""
+    if sys.platform == 'win32':
+        base = os.environ.get('APPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CONFIG_HOME') or os.path.join(os.path.expanduser('~'), '.config')
+    return os.path.join(base, 'webp_to_png', PROFILE_FILE_NAME)
+
+
+def _load_profiles():
+    try:
+        with open(profile_path(), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _profile_key(folder, objective):
+    return f"{socket.gethostname()}|{os.path.abspath(folder)}|{objective}"
+
+
+def load_profile(folder, objective):
+    """读取本机该文件夹保存的调优结果，不存在或已失效时返回None"""
+    profile = _load_profiles().get(_profile_key(folder, objective))
+    if not profile or profile.get('cpu_count') != os.cpu_count():
+        return None
+    return profile
+
+
+def save_profile(folder, result):
+    """保存调优结果（先写临时文件再替换，避免中断时损坏）"""
+    path = profile_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    profiles = _load_profiles()
+    profiles[_profile_key(folder, result['objective'])] = result
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(profiles, f, ensure_ascii=False, indent=1)
+    os.replace(temp_path, path)
+
+
+def sample_files(paths, count=DEFAULT_SAMPLE_SIZE):
+    """按文件大小等间隔抽样，使样本覆盖从小图到大图的分布"""
+    sized = []
+    for path in paths:
+        try:
+            sized.append((os.path.getsize(path), path))
+        except OSError:
+            continue
+    sized.sort()
+    if len(sized) <= count:
+        return [path for _, path in sized]
+    step = (len(sized) - 1) / (count - 1) if count > 1 else 0
+    return [sized[round(i * step)][1] for i in range(count)]
+
+
+def measure_encoders(paths, options, candidates=ENCODER_CANDIDATES, should_stop=None):
+    """
+    单线程测量各编码设置：每个样本只解码一次，再按每种设置分别编码
+    返回 [{'optimize', 'compress_level', 'seconds', 'bytes'}]
+    """
+    results = [dict(candidate, seconds=0.0, bytes=0) for candidate in candidates]
+    for path in paths:
+        if should_stop and should_stop():
+            break
+        try:
+            with Image.open(path) as img:
+                img.load()
+                prepared, metadata = process_image(img, options)
+        except Exception:
+            continue
+        for result in results:
+            encoder_options = dict(options, optimize=result['optimize'],
+                                   compress_level=result['compress_level'])
+            start = time.perf_counter()
+            buffer = encode_png(prepared, encoder_options, metadata)
+            result['seconds'] += time.perf_counter() - start
+            result['bytes'] += buffer.getbuffer().nbytes
+    return results
+
+
+def choose_encoder(results, objective):
+    """按目标选出编码设置"""
+    if objective == "fastest":
+        return min(results, key=lambda r: (r['seconds'], r['bytes']))
+    if objective == "smallest":
+        return min(results, key=lambda r: (r['bytes'], r['seconds']))
+    # 均衡：耗时和体积相对于各自最优值的乘积最小
+    fastest = min(r['seconds'] for r in results) or 1e-9
+    smallest = min(r['bytes'] for r in results) or 1
+    return min(results, key=lambda r: (r['seconds'] / fastest) * (r['bytes'] / smallest))
+
+
+def candidate_configs(cpu_count=None):
+    """候选并发配置: [(转换线程数, 池类型)]，单线程时不尝试进程池"""
+    cpu_count = cpu_count or default_workers()
+    workers = sorted({1, max(1, cpu_count // 2), cpu_count})
+    configs = []
+    for count in workers:
+        configs.append((count, "thread"))
+        if count > 1:
+            configs.append((count, "process"))
+    return configs
+
+
+def measure_config(paths, options, workers, backend, scratch_folder):
+    """
+    用真实的转换流程（预读、准入、转换、缓冲写入）转换样本，写到临时文件夹
+    每个配置使用单独创建的转换池，进程池的子进程也是新启动的
+    返回 {'workers', 'backend', 'seconds', 'files_per_second', 'peak_rss', 'rss_measured', 'failed'}
+    rss_measured 为False表示本进程的峰值无法按配置重置（非Linux），peak_rss 不能用于比较
+    """
+    run_options = dict(options, workers=workers, backend=backend)
+    jobs = [(path, os.path.join(scratch_folder, f"{i}.png")) for i, path in enumerate(paths)]
+    rss_measured = reset_peak_rss()
+    failed = 0
+    worker_rss = WorkerPeakRss()
+    start = time.perf_counter()
+    for result in run_conversion(jobs, run_options):
+        if not result['success']:
+            failed += 1
+        worker_rss.add(result)
+    seconds = time.perf_counter() - start
+    # 子进程的内存不计入本进程；子进程是本配置新启动的，加上各自完整的峰值（包括解释器本身）
+    rss = total_peak_rss(worker_rss) or 0
+    for _, output_path in jobs:
+        try:
+            os.remove(output_path)
+        except OSError:
+            pass
+    return {
+        'workers': workers,
+        'backend': backend,
+        'seconds': seconds,
+        'files_per_second': len(jobs) / seconds if seconds > 0 else 0.0,
+        'peak_rss': rss,
+        'rss_measured': rss_measured,
+        'failed': failed,
+    }
+
+
+def choose_config(results, objective):
+    """
+    按目标选出并发配置：最快只看吞吐量，其余在接近最快的配置中选内存占用最低的
+    峰值内存无法按配置分别统计时只看吞吐量
+    """
+    best = max(results, key=lambda r: r['files_per_second'])
+    if objective == "fastest" or not all(r.get('rss_measured', True) for r in results):
+        return best
+    near = [r for r in results
+            if r['files_per_second'] >= best['files_per_second'] * THROUGHPUT_TOLERANCE]
+    return min(near, key=lambda r: (r['peak_rss'], r['workers']))
+
+
+def auto_tune(paths, options, objective="balanced", scratch_parent=None,
+              sample_size=DEFAULT_SAMPLE_SIZE, log=None, should_stop=None):
+    """
+    在样本上校准并返回调优结果：
+    objective, options（workers / backend / optimize / compress_level）, encoders, configs,
+    sample_size, cpu_count, created
+    scratch_parent 为临时输出所在的文件夹（应与真实输出在同一个磁盘上）
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"未知的调优目标: {objective}")
+    log = log or (lambda message: None)
+    sample = sample_files(paths, sample_size)
+    if not sample:
+        raise ValueError("没有可用于校准的文件")
+
+    log(f"自动调优（目标: {OBJECTIVE_NAMES[objective]}），样本 {len(sample)} 个文件")
+    encoders = measure_encoders(sample, options, should_stop=should_stop)
+    for r in encoders:
+        log(f"  编码 optimize={r['optimize']} 级别{r['compress_level']}: "
+            f"{r['seconds']:.2f} 秒，{r['bytes'] / 1024:.0f}KB")
+    encoder = choose_encoder(encoders, objective)
+    tuned = {'optimize': encoder['optimize'], 'compress_level': encoder['compress_level']}
+
+    configs = []
+    scratch_folder = tempfile.mkdtemp(prefix='.autotune-', dir=scratch_parent)
+    try:
+        base_options = dict(options, **tuned)
+        # 预热：使样本进入页缓存，各候选配置在相同条件下比较
+        measure_config(sample, base_options, default_workers(), "thread", scratch_folder)
+        for workers, backend in candidate_configs():
+            if should_stop and should_stop():
+                break
+            r = measure_config(sample, base_options, workers, backend, scratch_folder)
+            configs.append(r)
+            log(f"  {workers} 个{BACKEND_NAMES[backend]}: "
+                f"{r['files_per_second']:.1f} 文件/秒，峰值内存 {r['peak_rss'] / 1024 / 1024:.0f} MB")
+    finally:
+        shutil.rmtree(scratch_folder, ignore_errors=True)
+
+    if not configs:
+        raise InterruptedError("自动调优已取消")
+    if objective != "fastest" and not all(r['rss_measured'] for r in configs):
+        log("  当前平台无法按配置分别统计峰值内存（上面的内存数值为进程启动以来的最大值），只按吞吐量选择")
+    config = choose_config(configs, objective)
+    tuned.update(workers=config['workers'], backend=config['backend'])
+    log(f"选用: {config['workers']} 个{BACKEND_NAMES[config['backend']]}，"
+        f"optimize={tuned['optimize']}，压缩级别 {tuned['compress_level']}")
+    return {
+        'objective': objective,
+        'options': tuned,
+        'encoders': encoders,
+        'configs': configs,
+        'sample_size': len(sample),
+        'cpu_count': os.cpu_count(),
+        'created': time.time(),
+    }
+
+
+def tuned_options(folder, paths, options, objective="balanced", scratch_parent=None,
+                  retune=False, log=None, should_stop=None):
+    """
+    返回该文件夹在本机的调优选项：有保存的结果时直接沿用，否则校准并保存
+    """
+    log = log or (lambda message: None)
+    if not retune:
+        profile = load_profile(folder, objective)
+        if profile is not None:
+            tuned = profile['options']
+            log(f"沿用保存的调优配置（目标: {OBJECTIVE_NAMES[objective]}）: "
+                f"{tuned['workers']} 个{BACKEND_NAMES[tuned['backend']]}，"
+                f"optimize={tuned['optimize']}，压缩级别 {tuned['compress_level']}")
+            return dict(tuned)
+    result = auto_tune(paths, options, objective, scratch_parent=scratch_parent, log=log,
+                       should_stop=should_stop)
+    try:
+        save_profile(folder, result)
+    except OSError as e:
+        log(f"无法保存调优配置: {e}")
+    return dict(result['options'])
@@ -0,0 +1,257 @@
+"""
+多节点协作（集群模式）
+多台机器在同一共享存储上转换同一个文件夹时，通过输出目录中的租约文件分配工作：
+- 文件按名称哈希分到固定数量的批次，各节点看到的批次划分一致
+- 节点以 O_EXCL 原子创建租约文件来认领批次，不需要中心协调者
+- 工作期间后台线程定期续租（更新租约文件的修改时间）
+- 租约超时未续的批次视为节点已崩溃，可被其他节点以更高的代数重新认领
+- 批次完成后写入完成标记，标记内容与批次文件列表的签名对应
+同一台机器上的多个进程使用不同的节点ID，即可模拟多节点
+"""
+import os
+import socket
+import threading
+import time
+import zlib
+
+# 集群状态目录名（位于输出文件夹内）
+CLUSTER_DIR_NAME = ".cluster"
+
+DEFAULT_LEASE_TIMEOUT = 60.0
+DEFAULT_BATCH_COUNT = 64
+
+
+def default_node_id():
+    """默认节点ID：主机名-进程号"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def bucket_of(filename, batch_count):
+    """文件所属批次（与节点和列举顺序无关）"""
+    return zlib.crc32(filename.encode('utf-8')) % batch_count
+
+
+def batch_signature(filenames):
+    """批次内容签名，文件列表变化后完成标记随之失效"""
+    return f"{zlib.crc32(chr(0).join(sorted(filenames)).encode('utf-8')):08x}"
+
+
+class Batch:
+    """一个已认领的批次"""
+
+    def __init__(self, coordinator, bucket, generation, files):
+        self.coordinator = coordinator
+        self.bucket = bucket
+        self.generation = generation
+        self.files = files
+        # 租约被其他节点接管后置为True，持有者应尽快停止处理该批次
+        self.lost = False
+        self.finished = False
+
+    @property
+    def lease_path(self):
+        return self.coordinator.lease_path(self.bucket, self.generation)
+
+    def still_held(self):
+        """
+        立即检查租约是否仍由本节点持有（不等待续租线程），已失去时置 lost
+        每个输出替换为正式文件前调用，被接管后旧持有者不再落盘
+        """
+        if not self.lost and self.coordinator.is_taken_over(self):
+            self.lost = True
+        return not self.lost
+
+    def complete(self):
+        """批次处理完毕：写入完成标记并释放租约"""
+        if self.finished:
+            return
+        if not self.lost:
+            self.coordinator.mark_done(self.bucket, self.files)
+        self.release()
+
+    def release(self):
+        """释放租约（不写完成标记）"""
+        if self.finished:
+            return
+        self.finished = True
+        self.coordinator.forget(self)
+        if not self.lost:
+            try:
+                os.remove(self.lease_path)
+            except OSError:
+                pass
+
+
+class ClusterCoordinator:
+    """
+    基于租约文件的批次认领
+    租约文件名为 bucket-XXXX.lease.<代数>，新认领者只能原子创建比现有最高代数大一的文件，
+    因此同一时刻只有一个节点能接管过期租约
+    """
+
+    def __init__(self, state_dir, node_id=None, lease_timeout=DEFAULT_LEASE_TIMEOUT,
+                 batch_count=DEFAULT_BATCH_COUNT):
+        self.state_dir = state_dir
+        self.node_id = node_id or default_node_id()
+        self.lease_timeout = lease_timeout
+        self.batch_count = max(1, batch_count)
+        self._held = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat = None
+        os.makedirs(state_dir, exist_ok=True)
+
+    def lease_path(self, bucket, generation):
+        return os.path.join(self.state_dir, f"bucket-{bucket:04d}.lease.{generation}")
+
+    def done_path(self, bucket):
+        return os.path.join(self.state_dir, f"bucket-{bucket:04d}.done")
+
+    def _generations(self, bucket):
+        """列出批次现有的租约代数"""
+        prefix = f"bucket-{bucket:04d}.lease."
+        generations = []
+        for entry in os.scandir(self.state_dir):
+            if entry.name.startswith(prefix):
+                try:
+                    generations.append(int(entry.name[len(prefix):]))
+                except ValueError:
+                    pass
+        return sorted(generations)
+
+    def is_done(self, bucket, files):
+        """批次是否已由某个节点完成（且文件列表未变化）"""
+        try:
+            with open(self.done_path(bucket), encoding='utf-8') as f:
+                return f.read().split()[0] == batch_signature(files)
+        except (OSError, IndexError):
+            return False
+
+    def mark_done(self, bucket, files):
+        """原子写入完成标记"""
+        path = self.done_path(bucket)
+        temp_path = f"{path}.{self.node_id}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(f"{batch_signature(files)} {self.node_id} {time.time():.0f}\n")
+        os.replace(temp_path, path)
+
+    def _is_stale(self, path):
+        try:
+            return time.time() - os.path.getmtime(path) > self.lease_timeout
+        except OSError:
+            # 租约刚被释放或接管
+            return False
+
+    def try_claim(self, bucket, files):
+        """尝试认领批次，成功返回 Batch，否则返回None"""
+        generations = self._generations(bucket)
+        if generations:
+            top = generations[-1]
+            if not self._is_stale(self.lease_path(bucket, top)):
+                return None
+            generation = top + 1
+        else:
+            generation = 0
+
+        try:
+            fd = os.open(self.lease_path(bucket, generation), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            # 其他节点抢先认领
+            return None
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(f"{self.node_id} {time.time():.0f}\n")
+
+        # 完成标记可能在列举之后才写入
+        if self.is_done(bucket, files):
+            os.remove(self.lease_path(bucket, generation))
+            return None
+
+        # 清理被接管的旧租约
+        for old in generations:
+            try:
+                os.remove(self.lease_path(bucket, old))
+            except OSError:
+                pass
+
+        batch = Batch(self, bucket, generation, files)
+        with self._lock:
+            self._held.append(batch)
+        self._ensure_heartbeat()
+        return batch
+
+    def is_taken_over(self, batch):
+        """批次的租约是否已被释放或被更高代数接管"""
+        newer = self.lease_path(batch.bucket, batch.generation + 1)
+        return os.path.exists(newer) or not os.path.exists(batch.lease_path)
+
+    def forget(self, batch):
+        with self._lock:
+            if batch in self._held:
+                self._held.remove(batch)
+
+    def _ensure_heartbeat(self):
+        if self._heartbeat is None or not self._heartbeat.is_alive():
+            self._heartbeat = threading.Thread(target=self._renew_loop, name='lease-renew',
+                                               daemon=True)
+            self._heartbeat.start()
+
+    def _renew_loop(self):
+        """定期续租，并检测租约是否已被其他节点接管"""
+        interval = max(0.1, self.lease_timeout / 3)
+        while not self._stop.wait(interval):
+            with self._lock:
+                held = list(self._held)
+            for batch in held:
+                if self.is_taken_over(batch):
+                    batch.lost = True
+                    continue
+                try:
+                    os.utime(batch.lease_path)
+                except OSError:
+                    batch.lost = True
+
+    def batches(self, filenames):
+        """
+        逐个认领并产出待处理的批次
+        不同节点从不同批次开始扫描以减少争抢；一轮扫描后如仍有被他人持有的批次，
+        等待其完成或超时后再尝试接管
+        """
+        buckets = {}
+        for filename in filenames:
+            buckets.setdefault(bucket_of(filename, self.batch_count), []).append(filename)
+
+        order = sorted(buckets)
+        start = zlib.crc32(self.node_id.encode('utf-8')) % len(order) if order else 0
+        remaining = order[start:] + order[:start]
+
+        while remaining:
+            waiting = []
+            for bucket in remaining:
+                files = buckets[bucket]
+                if self.is_done(bucket, files):
+                    continue
+                batch = self.try_claim(bucket, files)
+                if batch is None:
+                    waiting.append(bucket)
+                    continue
+                try:
+                    yield batch
+                finally:
+                    batch.release()
+            remaining = waiting
+            if remaining:
+                time.sleep(min(5.0, max(0.1, self.lease_timeout / 4)))
+
+    def close(self):
+        """释放所有仍持有的租约并停止续租"""
+        with self._lock:
+            held = list(self._held)
+        for batch in held:
+            batch.release()
+        self._stop.set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,110 @@
+"""
+色彩管理与元数据
+- keep: 像素不变，把源文件的ICC配置文件和EXIF原样写入PNG（默认）
+- srgb: 按嵌入的ICC配置文件把像素转换到sRGB，PNG中不再嵌入配置文件
+构建 ImageCms 转换的代价较高，已构建的转换按配置文件字节内容缓存（LRU），
+同一相机/软件导出的成千上万个文件只需构建一次；源配置文件本身就是sRGB时完全跳过转换
+"""
+import io
+from functools import lru_cache
+
+COLOR_MODES = ("keep", "srgb")
+COLOR_MODE_NAMES = {
+    "keep": "保留ICC/EXIF",
+    "srgb": "转换为sRGB",
+}
+
+# 缓存的转换数量
+TRANSFORM_CACHE_SIZE = 32
+
+# 可以直接转换的模式: 源模式 -> 输出模式
+_TRANSFORM_MODES = {'RGB': 'RGB', 'RGBA': 'RGBA', 'CMYK': 'RGB'}
+
+
+@lru_cache(maxsize=1)
+def _image_cms():
+    """
+    按需导入 ImageCms：只有转换为sRGB时才用到，不拖慢命令行的启动
+    Pillow 未带 littlecms 支持时返回None
+    """
+    try:
+        from PIL import ImageCms
+    except ImportError:
+        return None
+    return ImageCms
+
+
+def _transform_flags():
+    """转换会在多个线程中同时使用，关闭littlecms内部的单像素缓存以保证线程安全"""
+    flags = getattr(_image_cms(), 'Flags', None)
+    return flags.NOCACHE if flags is not None else 0x0040
+
+
+@lru_cache(maxsize=1)
+def _srgb_profile():
+    ImageCms = _image_cms()
+    return ImageCms.ImageCmsProfile(ImageCms.createProfile('sRGB'))
+
+
+def is_srgb_profile(profile):
+    """配置文件是否为sRGB（按描述判断，兼容各厂商的sRGB IEC61966-2.1）"""
+    description = _image_cms().getProfileDescription(profile) or ''
+    return 'srgb' in description.lower().replace(' ', '')
+
+
+@lru_cache(maxsize=TRANSFORM_CACHE_SIZE)
+def get_srgb_transform(icc_profile, in_mode, out_mode):
+    """
+    返回把 icc_profile 转换到sRGB的转换对象（按配置文件字节和模式缓存）
+    源已是sRGB时返回None，表示无需转换
+    """
+    ImageCms = _image_cms()
+    profile = ImageCms.ImageCmsProfile(io.BytesIO(icc_profile))
+    if is_srgb_profile(profile):
+        return None
+    return ImageCms.buildTransform(profile, _srgb_profile(), in_mode, out_mode,
+                                   flags=_transform_flags())
+
+
+def transform_cache_info():
+    """转换缓存的命中统计"""
+    return get_srgb_transform.cache_info()
+
+
+def extract_metadata(img):
+    """读取需要写入PNG的元数据"""
+    metadata = {}
+    icc_profile = img.info.get('icc_profile')
+    if icc_profile:
+        metadata['icc_profile'] = icc_profile
+    exif = img.info.get('exif')
+    if exif:
+        metadata['exif'] = exif
+    return metadata
+
+
+def apply_color_management(img, options):
+    """
+    按 color_mode 处理色彩
+    返回 (图片, 写入PNG的元数据字典)
+    """
+    metadata = extract_metadata(img)
+    if options.get('color_mode', 'keep') != 'srgb' or 'icc_profile' not in metadata:
+        return img, metadata
+
+    out_mode = _TRANSFORM_MODES.get(img.mode)
+    ImageCms = _image_cms()
+    if ImageCms is None or out_mode is None:
+        return img, metadata
+
+    try:
+        transform = get_srgb_transform(metadata['icc_profile'], img.mode, out_mode)
+    except (OSError, ImageCms.PyCMSError):
+        # 配置文件损坏或不受支持时保留原样（无法解析的配置文件抛出的是OSError）
+        return img, metadata
+
+    # 转换后像素已是sRGB，不再嵌入源配置文件
+    del metadata['icc_profile']
+    if transform is None:
+        return img, metadata
+    return ImageCms.applyTransform(img, transform), metadata
@@ -0,0 +1,503 @@
+"""
+WebP转PNG转换核心
+命令行版和PyQt5版共用的转换流程：预读 → 解码 → 色彩管理 → 处理透明通道 → 编码 → 缓冲写入
+"""
+import io
+import os
+import time
+from collections import deque
+from concurrent.futures import (ThreadPoolExecutor, ProcessPoolExecutor, BrokenExecutor, wait,
+                                FIRST_COMPLETED)
+
+from PIL import Image
+
+from webp_prefetch import (ReadAhead, BufferedWriter, MB, DEFAULT_PREFETCH_DEPTH,
+                           DEFAULT_IO_WORKERS, PATH_PENDING, PATH_POLL_INTERVAL)
+from webp_admission import (MemoryAdmission, AdmissionQueue, estimate_peak_memory,
+                            default_workers, peak_rss, DEFAULT_MEMORY_BUDGET_MB)
+from webp_color import apply_color_management
+from webp_shm import SlabPool, SlabBuffer, SlabHandle, write_slab, slab_view, attach
+
+# 默认输出文件夹名
+OUTPUT_FOLDER_NAME = "PNG_转换结果"
+
+# 默认预读内存预算（MB）
+DEFAULT_PREFETCH_MEMORY_MB = 256
+
+# 转换池类型：线程（Pillow 解码/压缩时释放GIL）或进程（文件数据经共享内存传给子进程）
+BACKENDS = ("thread", "process")
+BACKEND_NAMES = {
+    "thread": "线程",
+    "process": "进程",
+}
+
+
+def find_webp_files(folder, recursive=False, exclude=()):
+    """
+    查找文件夹中所有.webp文件（不区分大小写）
+    recursive 为真时包含子文件夹，返回相对路径；exclude 中的文件夹（如输出文件夹）会被跳过
+    """
+    if not recursive:
+        return [filename for filename in os.listdir(folder) if filename.lower().endswith('.webp')]
+
+    excluded = {os.path.abspath(path) for path in exclude}
+    webp_files = []
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) not in excluded]
+        relative_root = os.path.relpath(root, folder)
+        for filename in files:
+            if filename.lower().endswith('.webp'):
+                webp_files.append(filename if relative_root == '.'
+                                  else os.path.join(relative_root, filename))
+    return webp_files
+
+
+def prepare_image(img, options):
+    """
+    按选项处理图片模式
+    flatten_alpha 为真时把透明通道合并到白色背景上，并把其他模式转换为RGB
+    """
+    if not options.get('flatten_alpha', False):
+        return img
+
+    if img.mode in ('RGBA', 'LA', 'P', 'CMYK'):
+        if img.mode == 'RGBA':
+            # 创建一个白色背景
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            # 合并alpha通道
+            background.paste(img, mask=img.split()[-1])
+            return background
+        return img.convert('RGB')
+    return img
+
+
+def process_image(img, options):
+    """
+    解码后的全部像素处理：色彩管理 → 透明通道
+    返回 (图片, 写入PNG的元数据字典)
+    """
+    img, metadata = apply_color_management(img, options)
+    return prepare_image(img, options), metadata
+
+
+def encode_png(img, options, metadata=None):
+    """
+    把图片编码为PNG，返回内存缓冲区
+    metadata 给出时按其写入ICC配置文件和EXIF（不沿用图片自身的 info）
+    """
+    save_args = {'optimize': options.get('optimize', True)}
+    if 'compress_level' in options:
+        save_args['compress_level'] = options['compress_level']
+    if metadata is not None:
+        save_args['icc_profile'] = metadata.get('icc_profile')
+        if 'exif' in metadata:
+            save_args['exif'] = metadata['exif']
+
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG', **save_args)
+    return buffer
+
+
+def convert_image(img, options, open_seconds=0.0):
+    """
+    转换已打开（只读取了文件头）的图片，完成后关闭图片
+    返回 (PNG缓冲区, 图片信息字典)，信息中包含 decode/process/encode 各阶段耗时
+    """
+    start = time.perf_counter()
+    with img:
+        img.load()
+        decoded = time.perf_counter()
+        info = {'width': img.width, 'height': img.height, 'mode': img.mode}
+        prepared, metadata = process_image(img, options)
+        processed = time.perf_counter()
+        buffer = encode_png(prepared, options, metadata)
+    info['timings'] = {
+        'decode': open_seconds + decoded - start,
+        'process': processed - decoded,
+        'encode': time.perf_counter() - processed,
+    }
+    return buffer, info
+
+
+def convert_source(source, options):
+    """
+    转换单个源（路径或文件对象）
+    返回 (PNG缓冲区, 图片信息字典)
+    """
+    start = time.perf_counter()
+    img = Image.open(source)
+    return convert_image(img, options, time.perf_counter() - start)
+
+
+def _source_size(source):
+    """文件对象的总字节数"""
+    source.seek(0, io.SEEK_END)
+    size = source.tell()
+    source.seek(0)
+    return size
+
+
+def _result(input_path, output_path, success, message, info=None, size=0):
+    """构建单个文件的转换结果"""
+    result = {
+        'input_path': input_path,
+        'output_path': output_path,
+        'success': success,
+        'message': message,
+        'size': size,
+    }
+    result.update(info or {})
+    return result
+
+
+def _failure_message(error):
+    """转换失败的说明；转换进程意外退出时给出可能的原因"""
+    if isinstance(error, BrokenExecutor):
+        return "转换进程意外退出（可能因内存不足被系统结束）"
+    return str(error)
+
+
+def _finish(input_path, output_path, info, size, future):
+    """等待写入完成并生成结果"""
+    try:
+        info['timings']['write'] = future.result()
+    except Exception as e:
+        return _result(input_path, output_path, False, f"写入失败: {e}", info)
+    message = f"{info['width']}x{info['height']} ({size / 1024:.1f}KB)"
+    return _result(input_path, output_path, True, message, info, size)
+
+
+class ConversionPool:
+    """
+    可被多个转换任务共享的持久转换线程池和内存预算
+    多个文件夹排队转换时共用同一个池，一个任务收尾时下一个任务即可填满空闲的核心
+    进程池的子进程意外退出（如因内存不足被系统结束）后池不可再用，broken 置为True，
+    matches 随之返回False，使用者应重新创建
+    """
+
+    def __init__(self, workers=None, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, backend="thread"):
+        if backend not in BACKENDS:
+            raise ValueError(f"未知的转换池类型: {backend}")
+        self.workers = max(1, workers or default_workers())
+        self.memory_budget_mb = memory_budget_mb
+        self.backend = backend
+        self.slabs = None
+        self.broken = False
+        self._transfers = {}  # Future -> (输入内存块, 输出内存块)
+        if backend == "process":
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            self.slabs = SlabPool()
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers,
+                                               thread_name_prefix='convert')
+        self.admission = MemoryAdmission(memory_budget_mb * MB)
+
+    @classmethod
+    def from_options(cls, options):
+        return cls(options.get('workers'),
+                   options.get('memory_budget_mb', DEFAULT_MEMORY_BUDGET_MB),
+                   options.get('backend', 'thread'))
+
+    def matches(self, options):
+        """池的配置是否与选项一致（已损坏的池总是不一致）"""
+        return (not self.broken
+                and self.workers == max(1, options.get('workers') or default_workers())
+                and self.memory_budget_mb == options.get('memory_budget_mb',
+                                                         DEFAULT_MEMORY_BUDGET_MB)
+                and self.backend == options.get('backend', 'thread'))
+
+    def submit(self, job, options):
+        """提交一个已通过准入的任务；池已损坏时抛出 BrokenExecutor"""
+        try:
+            return self._submit(job, options)
+        except BrokenExecutor:
+            self.broken = True
+            raise
+
+    def _submit(self, job, options):
+        if self.backend != "process":
+            return self.executor.submit(_convert_job, job, options)
+
+        # 进程池：输入和输出都放在共享内存块中，只向子进程传递句柄
+        out_slab = self.slabs.acquire(_png_size_bound(job['img']))
+        try:
+            in_slab, in_handle = self._share_source(job)
+        except BaseException:
+            self.slabs.release(out_slab)
+            raise
+        try:
+            future = self.executor.submit(_convert_shared, in_handle,
+                                          SlabHandle(out_slab.name, out_slab.size),
+                                          options, job['open_seconds'])
+        except BaseException:
+            self.slabs.release(in_slab)
+            self.slabs.release(out_slab)
+            raise
+        self._transfers[future] = (in_slab, out_slab)
+        return future
+
+    def _share_source(self, job):
+        """把预读的文件内容复制到内存块，并关闭只读了文件头的图片（可能同时关闭文件）"""
+        source = job['source']
+        try:
+            data = source.getbuffer() if isinstance(source, io.BytesIO) else memoryview(source)
+            with data:
+                slab = self.slabs.acquire(data.nbytes)
+                return slab, write_slab(slab, data)
+        finally:
+            job['img'].close()
+            job['img'] = None
+            source.close()
+
+    def collect(self, future):
+        """取得已完成任务的 (PNG缓冲区, 图片信息字典)"""
+        transfer = self._transfers.pop(future, None)
+        if transfer is None:
+            return future.result()
+        in_slab, out_slab = transfer
+        self.slabs.release(in_slab)
+        try:
+            buffer, info = future.result()
+        except BrokenExecutor:
+            self.broken = True
+            self.slabs.release(out_slab)
+            raise
+        except BaseException:
+            self.slabs.release(out_slab)
+            raise
+        if isinstance(buffer, SlabHandle):
+            # 缓冲区写入完成后关闭时归还内存块
+            return SlabBuffer(self.slabs, out_slab, buffer.length), info
+        self.slabs.release(out_slab)
+        return buffer, info
+
+    def discard(self, future):
+        """丢弃已取消或不再需要结果的任务，归还其内存块"""
+        transfer = self._transfers.pop(future, None)
+        if transfer is not None:
+            for slab in transfer:
+                self.slabs.release(slab)
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+        if self.slabs is not None:
+            self.slabs.close()
+
+
+def _open_job(input_path, output_path, source, read_seconds, options):
+    """读取文件头，估算峰值内存，返回 (估算字节数, 任务)"""
+    job = {
+        'input_path': input_path,
+        'output_path': output_path,
+        'source': source,
+        'img': None,
+        'info': {'input_size': None},
+        'read_seconds': read_seconds,
+        'open_seconds': 0.0,
+    }
+    job['info']['input_size'] = input_size = _source_size(source)
+    start = time.perf_counter()
+    img = job['img'] = Image.open(source)
+    job['open_seconds'] = time.perf_counter() - start
+    cost = estimate_peak_memory(img.width, img.height, img.mode, input_size, options)
+    return cost, job
+
+
+def _discard_job(job):
+    """丢弃尚未开始的任务"""
+    if job['img'] is not None:
+        job['img'].close()
+    job['source'].close()
+
+
+def _convert_job(job, options):
+    """在转换线程中执行：解码 → 处理 → 编码"""
+    try:
+        return convert_image(job['img'], options, job['open_seconds'])
+    finally:
+        job['source'].close()
+
+
+def _png_size_bound(img):
+    """
+    PNG大小的上限估计：每像素按4字节，加上每行的过滤字节、zlib/数据块开销和元数据
+    超出时子进程改为直接返回缓冲区
+    """
+    raw = img.width * img.height * 4
+    metadata = sum(len(img.info.get(key) or b'') for key in ('icc_profile', 'exif'))
+    return raw + raw // 256 + img.height + metadata + 64 * 1024
+
+
+def _convert_shared(in_handle, out_handle, options, open_seconds):
+    """
+    在转换进程中执行：从共享内存读取WebP，PNG写回主进程提供的内存块
+    返回 (句柄或缓冲区, 图片信息字典)
+    Pillow 的WebP解码器总是把整个文件读成 bytes，因此从内存块复制一次不可避免；
+    BytesIO 包装 bytes 时共享同一对象，读取时不再复制第二次
+    """
+    with slab_view(in_handle) as data:
+        source = io.BytesIO(bytes(data))
+    buffer, info = convert_source(source, options)
+    info['timings']['decode'] += open_seconds
+    info['worker_pid'] = os.getpid()
+    info['worker_peak_rss'] = peak_rss() or 0
+    with buffer.getbuffer() as png:
+        length = png.nbytes
+        if length <= out_handle.length:
+            attach(out_handle.name).buf[:length] = png
+            return SlabHandle(out_handle.name, length), info
+    return buffer, info
+
+
+def run_conversion(jobs, options, should_stop=None, pool=None, on_tail=None, before_commit=None):
+    """
+    执行一批转换任务
+    jobs 为 (输入路径, 输出路径) 的可迭代对象（可以是边读边产生的生成器，暂时没有新任务时可产出
+    PATH_PENDING，此时先产出已完成的结果，不阻塞等待输入）；按完成顺序逐个产出结果字典：
+    input_path, output_path, success, message, size, input_size, width, height, mode, timings
+    （进程池时另有 worker_pid，以及 worker_peak_rss：该转换进程启动以来的峰值常驻内存，
+    包括解释器本身；Windows 等使用 spawn 的平台上各进程之间没有共享内存）
+    I/O 相关选项：prefetch_depth、prefetch_memory_mb、io_workers
+    并发相关选项：workers（转换线程数）、memory_budget_mb（同时解码的内存预算）、
+    backend（thread / process）
+    Pillow 在WebP解码和zlib压缩时释放GIL，多个转换线程可以真正并行
+    pool 为共享的 ConversionPool（为None时本次单独创建）；
+    on_tail 在所有任务都已提交、只剩收尾时调用一次，可用于提前启动下一个任务；
+    before_commit 在每个输出替换为正式文件前调用，返回False时放弃该输出（结果为写入失败）
+    """
+    memory_budget = options.get('prefetch_memory_mb', DEFAULT_PREFETCH_MEMORY_MB) * MB
+    io_workers = options.get('io_workers', DEFAULT_IO_WORKERS)
+    own_pool = pool is None
+    if own_pool:
+        pool = ConversionPool.from_options(options)
+    workers = pool.workers
+
+    # 预读器按顺序取输入路径，对应的输出路径按相同顺序排队，jobs 只被遍历一次
+    output_paths = deque()
+
+    def input_paths():
+        for job in jobs:
+            if job is PATH_PENDING:
+                yield job
+                continue
+            input_path, output_path = job
+            output_paths.append(output_path)
+            yield input_path
+
+    def items():
+        for item in reader:
+            if item is PATH_PENDING:
+                yield item
+                continue
+            path, *read = item
+            yield (path, output_paths.popleft()), read
+
+    reader = ReadAhead(
+        input_paths(),
+        depth=max(options.get('prefetch_depth', DEFAULT_PREFETCH_DEPTH), workers),
+        memory_budget=memory_budget,
+        io_workers=io_workers,
+    )
+    writer = BufferedWriter(memory_budget=memory_budget, io_workers=io_workers)
+    admission = pool.admission
+    waiting = AdmissionQueue(admission)
+    running = {}  # Future -> (估算字节数, 任务)
+    pending = deque()
+    items = items()
+    exhausted = False
+
+    try:
+        while True:
+            stopping = bool(should_stop and should_stop())
+            input_pending = False
+
+            # 读取文件头并排队等待准入
+            while not stopping and not exhausted and len(waiting) < workers * 4:
+                item = next(items, None)
+                if item is None:
+                    exhausted = True
+                    break
+                if item is PATH_PENDING:
+                    input_pending = True
+                    break
+                (input_path, output_path), (source, error, read_seconds) = item
+                if error is not None:
+                    yield _result(input_path, output_path, False, str(error))
+                    continue
+                try:
+                    cost, job = _open_job(input_path, output_path, source, read_seconds, options)
+                except Exception as e:
+                    source.close()
+                    yield _result(input_path, output_path, False, str(e))
+                    continue
+                # 排队期间源文件已不计入预读的字节预算，改为计入准入预算
+                waiting.add(cost, job, job['info']['input_size'] or 0)
+
+            if stopping:
+                for _, job in waiting.pop_all():
+                    _discard_job(job)
+
+            # 启动内存预算内放得下的任务，放不下的大图不阻塞后面的小图
+            for cost, job in waiting.pop_admitted(workers - len(running)):
+                try:
+                    running[pool.submit(job, options)] = (cost, job)
+                except Exception as e:
+                    admission.release(cost)
+                    _discard_job(job)
+                    yield _result(job['input_path'], job['output_path'], False,
+                                  _failure_message(e), job['info'])
+
+            if on_tail and (exhausted or stopping) and not len(waiting):
+                on_tail()
+                on_tail = None
+
+            if not running:
+                while pending and pending[0][-1].done():
+                    yield _finish(*pending.popleft())
+                if not len(waiting) and (exhausted or stopping):
+                    break
+                continue
+
+            # 输入暂时没有新路径时限时等待，以便及时取到之后到达的路径
+            done, _ = wait(running, timeout=PATH_POLL_INTERVAL if input_pending else None,
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                cost, job = running.pop(future)
+                admission.release(cost)
+                input_path, output_path = job['input_path'], job['output_path']
+                try:
+                    buffer, info = pool.collect(future)
+                except Exception as e:
+                    yield _result(input_path, output_path, False, _failure_message(e), job['info'])
+                    continue
+
+                info['input_size'] = job['info']['input_size']
+                info['timings'] = {'read': job['read_seconds'], **info['timings']}
+                size = buffer.getbuffer().nbytes
+                write = writer.write(output_path, buffer, before_commit)
+                # 写入完成后立即释放缓冲区（共享内存块归还给池）
+                write.add_done_callback(lambda _, buffer=buffer: buffer.close())
+                pending.append((input_path, output_path, info, size, write))
+
+            # 产出已经写完的结果
+            while pending and pending[0][-1].done():
+                yield _finish(*pending.popleft())
+
+        while pending:
+            yield _finish(*pending.popleft())
+    finally:
+        for _, job in waiting.pop_all():
+            _discard_job(job)
+        # 共享池中可能还有本任务未完成的转换，等待其结束并归还内存预算
+        for future in running:
+            future.cancel()
+        wait(running)
+        for future, (cost, job) in running.items():
+            admission.release(cost)
+            pool.discard(future)
+            if future.cancelled():
+                _discard_job(job)
+        if own_pool:
+            pool.shutdown()
+        reader.close()
+        writer.close()
@@ -0,0 +1,466 @@
+"""
+文件列表（PyQt5）
+- 后台线程扫描文件夹，行数据按需分批加载到 QAbstractTableModel
+- 缩略图只为可见行生成：后台线程池按“最近请求优先”处理，先整数倍缩小再精细缩放
+- 缩略图缓存分两级：内存LRU（按字节数限制）和磁盘缓存（重新打开文件夹时复用，
+  同样按字节数限制，超出时按修改时间淘汰最久未使用的文件）
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict, deque
+
+from PyQt5.QtCore import (Qt, QAbstractTableModel, QModelIndex, QObject, QRunnable,
+                          QThread, QThreadPool, QStandardPaths, pyqtSignal)
+from PyQt5.QtGui import QColor, QImage
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+# 缩略图边长
+THUMBNAIL_SIZE = 48
+# 内存缓存上限
+DEFAULT_MEMORY_CACHE_BYTES = 64 * 1024 * 1024
+# 磁盘缓存上限；超出时淘汰到上限的90%，避免每次写入都重新扫描
+DEFAULT_DISK_CACHE_BYTES = 256 * 1024 * 1024
+DISK_CACHE_LOW_WATER = 0.9
+# 每次 fetchMore 加载的行数
+FETCH_BATCH = 1000
+# 扫描线程每批发送的行数
+SCAN_BATCH = 2000
+# 等待生成的缩略图上限，超出时丢弃最早的请求（通常已滚出可见区域）
+MAX_PENDING_THUMBNAILS = 512
+
+
+def default_cache_dir():
+    """磁盘缩略图缓存目录"""
+    base = QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation)
+    if not base:
+        base = os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "webp_to_png", "thumbnails")
+
+
+def format_size(size):
+    """格式化文件大小"""
+    if size < 1024:
+        return f"{size} B"
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f} KB"
+    return f"{size / 1024 / 1024:.1f} MB"
+
+
+def pil_to_qimage(img):
+    """把PIL图片转换为独立持有数据的QImage（可在非GUI线程调用）"""
+    img = img.convert('RGBA')
+    data = img.tobytes('raw', 'RGBA')
+    qimage = QImage(data, img.width, img.height, img.width * 4, QImage.Format_RGBA8888)
+    return qimage.copy()
+
+
+class ThumbnailCache:
+    """
+    两级缩略图缓存
+    键由路径、修改时间、文件大小和缩略图尺寸组成，源文件变化后自动失效
+    磁盘缓存命中时更新文件修改时间，淘汰时按修改时间从旧到新删除（LRU）
+    """
+
+    def __init__(self, cache_dir=None, memory_budget=DEFAULT_MEMORY_CACHE_BYTES,
+                 size=THUMBNAIL_SIZE, disk_budget=DEFAULT_DISK_CACHE_BYTES):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.size = size
+        self._memory = OrderedDict()  # 键 -> QImage
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._disk_bytes = None  # 首次写入时扫描缓存目录得到
+        self._disk_lock = threading.Lock()
+
+    def key_for(self, path, mtime_ns, file_size):
+        text = f"{os.path.abspath(path)}|{mtime_ns}|{file_size}|{self.size}"
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """从内存缓存取缩略图"""
+        with self._lock:
+            image = self._memory.get(key)
+            if image is not None:
+                self._memory.move_to_end(key)
+            return image
+
+    def put(self, key, image):
+        """放入内存缓存，超出预算时淘汰最久未使用的项"""
+        cost = image.sizeInBytes() if hasattr(image, 'sizeInBytes') else image.byteCount()
+        with self._lock:
+            if key in self._memory:
+                return
+            self._memory[key] = image
+            self._memory_bytes += cost
+            while self._memory_bytes > self.memory_budget and len(self._memory) > 1:
+                _, old = self._memory.popitem(last=False)
+                self._memory_bytes -= (old.sizeInBytes() if hasattr(old, 'sizeInBytes')
+                                       else old.byteCount())
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.png")
+
+    def load_disk(self, key):
+        """从磁盘缓存读取，返回 (QImage, 原图尺寸) 或None"""
+        path = self._disk_path(key)
+        try:
+            with Image.open(path) as img:
+                img.load()
+                dims = img.text.get('Source-Size')
+                dims = tuple(int(v) for v in dims.split('x')) if dims else None
+                image = pil_to_qimage(img)
+        except (OSError, ValueError):
+            return None
+        try:
+            # 标记为最近使用
+            os.utime(path)
+        except OSError:
+            pass
+        return image, dims
+
+    def _disk_entries(self):
+        """缓存目录中的缩略图文件：[(修改时间, 大小, 路径)]"""
+        entries = []
+        try:
+            subdirs = [entry.path for entry in os.scandir(self.cache_dir) if entry.is_dir()]
+        except OSError:
+            return entries
+        for subdir in subdirs:
+            try:
+                with os.scandir(subdir) as it:
+                    for entry in it:
+                        if entry.name.endswith('.png') and entry.is_file():
+                            stat = entry.stat()
+                            entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+            except OSError:
+                continue
+        return entries
+
+    def _track_disk(self, nbytes):
+        """记录新写入的字节数，超出磁盘预算时删除最久未使用的文件"""
+        with self._disk_lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+            else:
+                self._disk_bytes += nbytes
+            if self._disk_bytes <= self.disk_budget:
+                return
+            entries = sorted(self._disk_entries())
+            total = sum(size for _, size, _ in entries)
+            target = self.disk_budget * DISK_CACHE_LOW_WATER
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+            self._disk_bytes = total
+
+    def save_disk(self, key, thumbnail, dims):
+        """写入磁盘缓存（写失败不影响显示）"""
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            info = PngInfo()
+            info.add_text('Source-Size', f"{dims[0]}x{dims[1]}")
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            thumbnail.save(temp_path, format='PNG', pnginfo=info)
+            os.replace(temp_path, path)
+            self._track_disk(os.path.getsize(path))
+        except OSError:
+            pass
+
+    def render(self, path):
+        """
+        生成缩略图，返回 (PIL缩略图, 原图尺寸)
+        Pillow 的WebP解码器不支持 draft 缩减解码，只能按原尺寸解码；
+        thumbnail 以 reducing_gap 先用 reduce 整数倍缩小，再对小图精细缩放，
+        结果写入磁盘缓存，同一文件只解码一次
+        """
+        with Image.open(path) as img:
+            dims = img.size
+            img.thumbnail((self.size, self.size), Image.BILINEAR, reducing_gap=2.0)
+            return img.copy(), dims
+
+
+class _ThumbnailTask(QRunnable):
+    """线程池任务：处理一个最近请求的缩略图"""
+
+    def __init__(self, loader):
+        super().__init__()
+        self.loader = loader
+
+    def run(self):
+        self.loader.process_next()
+
+
+class ThumbnailLoader(QObject):
+    """
+    后台缩略图生成
+    请求以栈的方式处理（最近请求的先生成），快速滚动时不会被已滚出的行拖住
+    """
+
+    # 路径, 缓存键, QImage, 原图尺寸
+    thumbnail_ready = pyqtSignal(str, str, object, object)
+
+    def __init__(self, cache, max_threads=2, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self._pending = deque()
+        self._queued = set()
+        self._lock = threading.Lock()
+
+    def request(self, path, key):
+        """请求生成缩略图（重复请求会被忽略）"""
+        with self._lock:
+            if key in self._queued:
+                return
+            self._queued.add(key)
+            self._pending.append((path, key))
+            while len(self._pending) > MAX_PENDING_THUMBNAILS:
+                _, old_key = self._pending.popleft()
+                self._queued.discard(old_key)
+        self.pool.start(_ThumbnailTask(self))
+
+    def cancel_all(self):
+        """取消所有尚未开始的请求"""
+        with self._lock:
+            self._pending.clear()
+            self._queued.clear()
+
+    def process_next(self):
+        with self._lock:
+            if not self._pending:
+                return
+            path, key = self._pending.pop()
+
+        try:
+            cached = self.cache.load_disk(key)
+            if cached is not None:
+                image, dims = cached
+            else:
+                thumbnail, dims = self.cache.render(path)
+                self.cache.save_disk(key, thumbnail, dims)
+                image = pil_to_qimage(thumbnail)
+        except Exception:
+            image, dims = None, None
+        finally:
+            with self._lock:
+                self._queued.discard(key)
+
+        self.thumbnail_ready.emit(path, key, image, dims)
+
+
+class DirectoryScanner(QThread):
+    """
+    后台扫描文件夹中的.webp文件，分批发送 (扫描编号, [(文件名, 大小, 修改时间)])
+    扫描编号用于丢弃切换文件夹前已排队、尚未送达的旧批次
+    """
+
+    batch_found = pyqtSignal(int, list)
+    scan_finished = pyqtSignal(int, int)
+
+    def __init__(self, folder, scan_id=0):
+        super().__init__()
+        self.folder = folder
+        self.scan_id = scan_id
+        self._is_running = True
+
+    def run(self):
+        batch = []
+        total = 0
+        try:
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    if not self._is_running:
+                        return
+                    if not entry.name.lower().endswith('.webp'):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    batch.append((entry.name, stat.st_size, stat.st_mtime_ns))
+                    if len(batch) >= SCAN_BATCH:
+                        total += len(batch)
+                        self.batch_found.emit(self.scan_id, batch)
+                        batch = []
+        except OSError:
+            pass
+        if batch:
+            total += len(batch)
+            self.batch_found.emit(self.scan_id, batch)
+        self.scan_finished.emit(self.scan_id, total)
+
+    def stop(self):
+        self._is_running = False
+
+
+class FileTableModel(QAbstractTableModel):
+    """
+    文件列表模型
+    行数据: [文件名, 大小, 修改时间, 尺寸, 状态, 是否成功, 耗时]
+    扫描结果先进入缓冲，视图滚动到底部时通过 fetchMore 分批显示
+    """
+
+    COLUMNS = ("文件名", "大小", "尺寸", "状态", "耗时")
+    NAME, SIZE, MTIME, DIMS, STATUS, SUCCESS, SECONDS = range(7)
+
+    def __init__(self, loader, parent=None):
+        super().__init__(parent)
+        self.loader = loader
+        self.folder = None
+        self._rows = []
+        self._loaded = 0
+        self._index = {}  # 文件名 -> 行号
+        self._scanner = None
+        self._scan_id = 0
+        loader.thumbnail_ready.connect(self._on_thumbnail_ready)
+
+    # ---- 加载 ----
+
+    def load_folder(self, folder):
+        """重新扫描文件夹"""
+        if self._scanner is not None:
+            self._scanner.stop()
+            self._scanner.batch_found.disconnect(self._on_batch_found)
+            self._scanner.wait()
+        self.loader.cancel_all()
+
+        self.beginResetModel()
+        self.folder = folder
+        self._rows = []
+        self._loaded = 0
+        self._index = {}
+        self.endResetModel()
+
+        # 旧扫描线程已排队的批次可能在断开连接后才送达，按扫描编号丢弃
+        self._scan_id += 1
+        self._scanner = DirectoryScanner(folder, self._scan_id)
+        self._scanner.batch_found.connect(self._on_batch_found)
+        self._scanner.start()
+
+    def _on_batch_found(self, scan_id, batch):
+        if scan_id != self._scan_id:
+            return
+        for name, size, mtime_ns in batch:
+            self._index[name] = len(self._rows)
+            self._rows.append([name, size, mtime_ns, None, "待转换", None, None])
+        # 首屏直接显示，其余等视图请求
+        if self._loaded == 0:
+            self.fetchMore(QModelIndex())
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._loaded < len(self._rows)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(FETCH_BATCH, len(self._rows) - self._loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
+
+    # ---- 模型接口 ----
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self._loaded:
+            return None
+        row = self._rows[index.row()]
+        column = index.column()
+
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return row[self.NAME]
+            if column == 1:
+                return format_size(row[self.SIZE])
+            if column == 2:
+                return f"{row[self.DIMS][0]}x{row[self.DIMS][1]}" if row[self.DIMS] else ""
+            if column == 3:
+                return row[self.STATUS]
+            if column == 4:
+                return f"{row[self.SECONDS] * 1000:.0f} ms" if row[self.SECONDS] is not None else ""
+
+        elif role == Qt.DecorationRole and column == 0:
+            # 只有可见行会请求缩略图
+            key = self.loader.cache.key_for(self._path(row), row[self.MTIME], row[self.SIZE])
+            image = self.loader.cache.get(key)
+            if image is None:
+                self.loader.request(self._path(row), key)
+            return image
+
+        elif role == Qt.TextAlignmentRole and column in (1, 4):
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+
+        elif role == Qt.ForegroundRole and column == 3 and row[self.SUCCESS] is not None:
+            return QColor("#27ae60") if row[self.SUCCESS] else QColor("#e74c3c")
+
+        return None
+
+    def _path(self, row):
+        return os.path.join(self.folder, row[self.NAME])
+
+    # ---- 更新 ----
+
+    def _emit_row_changed(self, row_number, first=0, last=None):
+        if row_number < self._loaded:
+            last = len(self.COLUMNS) - 1 if last is None else last
+            self.dataChanged.emit(self.index(row_number, first), self.index(row_number, last))
+
+    def _on_thumbnail_ready(self, path, key, image, dims):
+        row_number = self._index.get(os.path.basename(path))
+        if row_number is None or self._path(self._rows[row_number]) != path:
+            # 已切换到其他文件夹
+            return
+        # 生成失败时缓存空图，避免反复重试
+        self.loader.cache.put(key, image if image is not None else QImage())
+        if dims and self._rows[row_number][self.DIMS] is None:
+            self._rows[row_number][self.DIMS] = dims
+        self._emit_row_changed(row_number, 0, 2)
+
+    def set_status(self, filename, status, success):
+        """更新文件的转换状态"""
+        row_number = self._index.get(filename)
+        if row_number is None:
+            return
+        self._rows[row_number][self.STATUS] = status
+        self._rows[row_number][self.SUCCESS] = success
+        self._emit_row_changed(row_number, 3, 3)
+
+    def set_result(self, filename, width, height, seconds):
+        """更新文件的尺寸和转换耗时"""
+        row_number = self._index.get(filename)
+        if row_number is None:
+            return
+        self._rows[row_number][self.DIMS] = (width, height)
+        self._rows[row_number][self.SECONDS] = seconds
+        self._emit_row_changed(row_number)
+
+    def reset_status(self):
+        """开始新一轮转换前清除状态"""
+        for row in self._rows:
+            row[self.STATUS] = "待转换"
+            row[self.SUCCESS] = None
+            row[self.SECONDS] = None
+        if self._loaded:
+            self.dataChanged.emit(self.index(0, 3), self.index(self._loaded - 1, 4))
@@ -0,0 +1,286 @@
+"""
+任务队列面板（PyQt5）
+多个输入文件夹各自带选项排队，按顺序（可调整优先级）执行，全部共用一个持久转换线程池。
+前一个任务进入收尾阶段（所有文件都已提交）时就启动下一个任务，避免每个文件夹结尾处核心空闲
+"""
+import os
+import time
+
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
+                             QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView)
+
+# 同时处于活动状态的任务数（当前任务 + 正在填补其收尾空档的下一个任务）
+MAX_ACTIVE_JOBS = 2
+
+STATUS_WAITING = "等待中"
+STATUS_RUNNING = "转换中"
+STATUS_DONE = "已完成"
+STATUS_FAILED = "出错"
+STATUS_STOPPED = "已停止"
+
+
+class QueuedJob:
+    """队列中的一个转换任务"""
+
+    def __init__(self, input_folder, output_folder, options):
+        self.input_folder = input_folder
+        self.output_folder = output_folder
+        self.options = options
+        self.status = STATUS_WAITING
+        self.worker = None
+        self.processed = 0
+        self.total = 0
+        self.success = 0
+        self.skipped = 0
+        self.failed = 0
+        self.started = None
+        self.finished = None
+        self.tail_reached = False
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def throughput(self):
+        """文件/秒"""
+        elapsed = self.elapsed()
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+
+class JobQueuePanel(QWidget):
+    """
+    任务队列面板
+    worker_factory(输入文件夹, 输出文件夹, 选项) 返回共用线程池的 ConversionWorker
+    """
+
+    log_message = pyqtSignal(str)
+    queue_finished = pyqtSignal()
+
+    COLUMNS = ("输入文件夹", "状态", "进度", "速度", "结果")
+
+    def __init__(self, worker_factory, parent=None):
+        super().__init__(parent)
+        self.worker_factory = worker_factory
+        self.jobs = []
+        self.running = False
+        self.queue_started = None
+        self.init_ui()
+
+        # 定时刷新进度和吞吐量
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(500)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().hide()
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        layout.addWidget(self.table)
+
+        buttons_layout = QHBoxLayout()
+        self.top_btn = QPushButton("置顶")
+        self.up_btn = QPushButton("上移")
+        self.down_btn = QPushButton("下移")
+        self.remove_btn = QPushButton("移除")
+        self.run_btn = QPushButton("▶ 运行队列")
+        self.stop_btn = QPushButton("■ 停止队列")
+        self.stop_btn.setEnabled(False)
+        for button in (self.top_btn, self.up_btn, self.down_btn, self.remove_btn):
+            buttons_layout.addWidget(button)
+        buttons_layout.addStretch()
+        buttons_layout.addWidget(self.run_btn)
+        buttons_layout.addWidget(self.stop_btn)
+        layout.addLayout(buttons_layout)
+
+        self.throughput_label = QLabel("队列为空")
+        self.throughput_label.setStyleSheet("color: #7f8c8d;")
+        layout.addWidget(self.throughput_label)
+
+        self.top_btn.clicked.connect(lambda: self.move_selected(None))
+        self.up_btn.clicked.connect(lambda: self.move_selected(-1))
+        self.down_btn.clicked.connect(lambda: self.move_selected(1))
+        self.remove_btn.clicked.connect(self.remove_selected)
+        self.run_btn.clicked.connect(self.start_queue)
+        self.stop_btn.clicked.connect(self.stop_queue)
+
+    # ---- 队列编辑 ----
+
+    def enqueue(self, input_folder, output_folder, options):
+        """加入队列；队列运行中时会在有空位时自动开始"""
+        job = QueuedJob(input_folder, output_folder, options)
+        self.jobs.append(job)
+        self.log_message.emit(f"已加入队列: {input_folder}")
+        self.refresh()
+        if self.running:
+            self.start_next()
+
+    def _selected_index(self):
+        rows = self.table.selectionModel().selectedRows()
+        return rows[0].row() if rows else None
+
+    def move_selected(self, offset):
+        """调整等待中任务的顺序；offset为None时置顶（排在所有等待任务之前）"""
+        index = self._selected_index()
+        if index is None or self.jobs[index].status != STATUS_WAITING:
+            return
+        waiting = [i for i, job in enumerate(self.jobs) if job.status == STATUS_WAITING]
+        position = waiting.index(index)
+        if offset is None:
+            target = waiting[0]
+        else:
+            new_position = position + offset
+            if not 0 <= new_position < len(waiting):
+                return
+            target = waiting[new_position]
+        job = self.jobs.pop(index)
+        self.jobs.insert(target, job)
+        self.refresh()
+        self.table.selectRow(target)
+
+    def remove_selected(self):
+        index = self._selected_index()
+        if index is None or self.jobs[index].status == STATUS_RUNNING:
+            return
+        del self.jobs[index]
+        self.refresh()
+
+    # ---- 执行 ----
+
+    def active_jobs(self):
+        return [job for job in self.jobs if job.status == STATUS_RUNNING]
+
+    def is_busy(self):
+        return bool(self.active_jobs())
+
+    def start_queue(self):
+        if not any(job.status == STATUS_WAITING for job in self.jobs):
+            self.log_message.emit("队列中没有等待的任务")
+            return
+        self.running = True
+        self.queue_started = time.time()
+        self.run_btn.setEnabled(False)
+        self.stop_btn.setEnabled(True)
+        self.refresh_timer.start()
+        self.start_next()
+
+    def stop_queue(self):
+        """停止队列：不再启动新任务，并停止正在运行的任务"""
+        self.running = False
+        for job in self.active_jobs():
+            job.worker.stop()
+        self.log_message.emit("正在停止队列...")
+
+    def start_next(self):
+        """
+        在活动任务不超过上限、且所有活动任务都已进入收尾阶段时启动下一个等待中的任务
+        """
+        if not self.running:
+            return
+        active = self.active_jobs()
+        if len(active) >= MAX_ACTIVE_JOBS or any(not job.tail_reached for job in active):
+            return
+        job = next((job for job in self.jobs if job.status == STATUS_WAITING), None)
+        if job is None:
+            if not active:
+                self.finish_queue()
+            return
+
+        if not os.path.isdir(job.input_folder):
+            job.status = STATUS_FAILED
+            self.log_message.emit(f"输入文件夹不存在: {job.input_folder}")
+            self.start_next()
+            return
+
+        job.status = STATUS_RUNNING
+        job.started = time.time()
+        job.worker = worker = self.worker_factory(job.input_folder, job.output_folder, job.options)
+        worker.progress_updated.connect(lambda current, total: self._on_progress(job, current, total))
+        worker.conversion_tail.connect(lambda: self._on_tail(job))
+        worker.conversion_finished.connect(
+            lambda success, skipped, failed: self._on_finished(job, success, skipped, failed))
+        worker.error_occurred.connect(lambda message: self._on_error(job, message))
+        worker.log_message.connect(self.log_message)
+        worker.start()
+        self.log_message.emit(f"队列任务开始: {job.input_folder}")
+        self.refresh()
+
+    def _on_progress(self, job, current, total):
+        job.processed = current
+        job.total = total
+
+    def _on_tail(self, job):
+        job.tail_reached = True
+        self.start_next()
+
+    def _on_finished(self, job, success, skipped, failed):
+        job.success, job.skipped, job.failed = success, skipped, failed
+        job.status = STATUS_DONE if self.running else STATUS_STOPPED
+        self._job_done(job)
+        self.log_message.emit(
+            f"队列任务完成: {job.input_folder}（成功 {success}，跳过 {skipped}，失败 {failed}，"
+            f"{job.throughput():.1f} 文件/秒）")
+
+    def _on_error(self, job, message):
+        job.status = STATUS_FAILED
+        self._job_done(job)
+        self.log_message.emit(f"队列任务出错: {job.input_folder}: {message}")
+
+    def _job_done(self, job):
+        job.finished = time.time()
+        job.tail_reached = True
+        job.worker.wait()
+        job.worker = None
+        self.refresh()
+        if self.running:
+            self.start_next()
+        elif not self.active_jobs():
+            self.finish_queue()
+
+    def finish_queue(self):
+        self.running = False
+        self.refresh_timer.stop()
+        self.run_btn.setEnabled(True)
+        self.stop_btn.setEnabled(False)
+        self.refresh()
+        self.queue_finished.emit()
+
+    # ---- 显示 ----
+
+    def refresh(self):
+        """刷新表格和吞吐量"""
+        self.table.setRowCount(len(self.jobs))
+        for row, job in enumerate(self.jobs):
+            progress = f"{job.processed}/{job.total}" if job.total else ""
+            speed = f"{job.throughput():.1f} 文件/秒" if job.started else ""
+            result = (f"成功 {job.success} / 跳过 {job.skipped} / 失败 {job.failed}"
+                      if job.finished else "")
+            for column, text in enumerate((job.input_folder, job.status, progress, speed, result)):
+                item = self.table.item(row, column)
+                if item is None:
+                    item = QTableWidgetItem()
+                    self.table.setItem(row, column, item)
+                item.setText(text)
+                if column in (2, 3):
+                    item.setTextAlignment(int(Qt.AlignRight | Qt.AlignVCenter))
+
+        if not self.jobs:
+            self.throughput_label.setText("队列为空")
+            return
+        waiting = sum(job.status == STATUS_WAITING for job in self.jobs)
+        text = f"共 {len(self.jobs)} 个任务，等待 {waiting} 个"
+        if self.queue_started is not None:
+            processed = sum(job.processed for job in self.jobs if job.started
+                            and job.started >= self.queue_started)
+            end = time.time() if self.running else max(
+                (job.finished or 0 for job in self.jobs), default=time.time())
+            elapsed = max(end - self.queue_started, 1e-6)
+            text += f"，总计 {processed} 个文件，总吞吐 {processed / elapsed:.1f} 文件/秒"
+        self.throughput_label.setText(text)
@@ -0,0 +1,191 @@
+"""
+输出目录布局
+单个文件夹中条目过多时，创建文件、os.path.exists、getsize 都会变慢，文件管理器也难以打开。
+支持以下布局：
+- flat   全部放在输出文件夹根目录（默认，与以前一致）
+- mirror 镜像输入文件夹的子目录结构
+- hash   按源路径哈希分片，例如 ab/cd/name.png
+- date   按源文件修改日期分片，例如 2024/05/31/name.png
+非 flat 布局会维护映射索引（源相对路径 → 输出相对路径），无需扫描即可找到输出文件
+输出文件名与源文件名相同（扩展名改为 .png）。plan 预先检查整批文件，只有真正重名的源
+（如包含子文件夹时 x/a.webp 与 y/a.webp）才在文件名后加上源相对路径的短摘要，例如 a_1a2b3c4d.png；
+根目录下的文件优先保留原文件名
+"""
+import hashlib
+import os
+import time
+
+LAYOUTS = ("flat", "mirror", "hash", "date")
+LAYOUT_NAMES = {
+    "flat": "平铺",
+    "mirror": "镜像输入目录",
+    "hash": "哈希分片",
+    "date": "日期分片",
+}
+
+INDEX_FILE_NAME = "output_index.tsv"
+
+
+def _normalize(relative_source):
+    """统一使用 / 作为分隔符，使索引和哈希与平台无关"""
+    return relative_source.replace(os.sep, '/')
+
+
+class OutputLayout:
+    """
+    根据布局计算输出路径，并缓存已创建的目录，避免每个文件都调用 makedirs
+    使用前应以整批源文件调用 plan；输出路径按 os.path.normcase 比较（Windows 上不区分大小写）
+    """
+
+    def __init__(self, input_folder, output_folder, layout="flat", shard_depth=2):
+        if layout not in LAYOUTS:
+            raise ValueError(f"未知的输出布局: {layout}")
+        self.input_folder = input_folder
+        self.output_folder = output_folder
+        self.layout = layout
+        self.shard_depth = shard_depth
+        self._created = {output_folder}
+        self._claimed = {}
+        self._planned = {}  # 源相对路径 -> 输出相对路径
+        self._index = None
+
+    def plan(self, relative_sources):
+        """
+        为整批源文件确定输出路径
+        输出路径相同的一组源中只有一个保留原文件名，其余加上摘要；
+        优先根目录下的文件，其次是小写 .webp 扩展名，再按路径排序。
+        所有节点和校验使用同一份文件列表，结果一致
+        """
+        groups = {}
+        for relative_source in relative_sources:
+            output = self._relative_output(relative_source, False)
+            groups.setdefault(os.path.normcase(output), []).append((relative_source, output))
+        for group in groups.values():
+            group.sort(key=lambda item: (os.path.dirname(item[0]) != '',
+                                         not item[0].endswith('.webp'), item[0]))
+            (first, output), *others = group
+            self._planned[first] = output
+            for relative_source, _ in others:
+                self._planned[relative_source] = self._relative_output(relative_source, True)
+
+    def relative_output(self, relative_source):
+        """源相对路径 → 输出相对路径（未经 plan 的源使用原文件名）"""
+        output = self._planned.get(relative_source)
+        if output is None:
+            output = self._relative_output(relative_source, False)
+        return output
+
+    def _relative_output(self, relative_source, with_digest):
+        directory, filename = os.path.split(relative_source)
+        stem = os.path.splitext(filename)[0]
+        digest = hashlib.sha1(_normalize(relative_source).encode('utf-8')).hexdigest()
+        png_filename = f"{stem}_{digest[:8]}.png" if with_digest else f"{stem}.png"
+
+        if self.layout == "mirror":
+            return os.path.join(directory, png_filename)
+        if self.layout == "hash":
+            shards = [digest[i * 2:i * 2 + 2] for i in range(self.shard_depth)]
+            return os.path.join(*shards, png_filename)
+        if self.layout == "date":
+            mtime = os.path.getmtime(os.path.join(self.input_folder, relative_source))
+            return os.path.join(time.strftime("%Y/%m/%d", time.localtime(mtime)), png_filename)
+        return png_filename
+
+    def output_path(self, relative_source):
+        """
+        源相对路径 → 输出绝对路径（同时确保所在目录存在）
+        输出路径已被另一个源占用时抛出ValueError，不会静默覆盖
+        """
+        path = os.path.join(self.output_folder, self.relative_output(relative_source))
+        key = os.path.normcase(path)
+        other = self._claimed.setdefault(key, relative_source)
+        if other != relative_source:
+            raise ValueError(f"输出路径与 {other} 冲突")
+        self.ensure_parent(path)
+        return path
+
+    def existing_output(self, relative_source):
+        """
+        已转换输出的绝对路径（用于校验）
+        非 flat 布局优先查映射索引：日期布局的路径取决于转换时的修改时间，之后修改源文件也能找到
+        """
+        if self.layout != "flat":
+            if self._index is None:
+                self._index = OutputIndex(self.output_folder)
+            path = self._index.lookup(relative_source)
+            if path is not None:
+                return path
+        return os.path.join(self.output_folder, self.relative_output(relative_source))
+
+    def ensure_parent(self, path):
+        parent = os.path.dirname(path)
+        if parent not in self._created:
+            os.makedirs(parent, exist_ok=True)
+            self._created.add(parent)
+
+
+class OutputIndex:
+    """
+    源 → 输出 映射索引（追加写入的TSV）
+    集群模式下每个节点写各自的索引文件，读取时合并所有 output_index*.tsv
+    """
+
+    def __init__(self, output_folder, node_id=None):
+        self.output_folder = output_folder
+        name = INDEX_FILE_NAME if not node_id else f"output_index.{node_id}.tsv"
+        self.path = os.path.join(output_folder, name)
+        self._file = None
+        self._entries = None
+
+    def add(self, relative_source, relative_output):
+        """记录一条映射"""
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8', newline='\n',
+                              buffering=256 * 1024)
+        line = f"{_normalize(relative_source)}\t{_normalize(relative_output)}\n"
+        self._file.write(line)
+        if self._entries is not None:
+            self._entries[_normalize(relative_source)] = _normalize(relative_output)
+
+    def _load(self):
+        entries = {}
+        try:
+            names = sorted(n for n in os.listdir(self.output_folder)
+                           if n.startswith("output_index") and n.endswith(".tsv"))
+        except OSError:
+            names = []
+        for name in names:
+            with open(os.path.join(self.output_folder, name), encoding='utf-8') as f:
+                for line in f:
+                    source, _, output = line.rstrip('\n').partition('\t')
+                    if output:
+                        entries[source] = output
+        self._entries = entries
+
+    def lookup(self, relative_source):
+        """查找源文件对应的输出绝对路径，不存在时返回None"""
+        if self._entries is None:
+            if self._file is not None:
+                self._file.flush()
+            self._load()
+        output = self._entries.get(_normalize(relative_source))
+        if output is None:
+            return None
+        return os.path.join(self.output_folder, *output.split('/'))
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def find_output(output_folder, relative_source):
+    """从索引中查找源文件的输出路径"""
+    with OutputIndex(output_folder) as index:
+        return index.lookup(relative_source)
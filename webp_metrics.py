@@ -0,0 +1,266 @@
+"""
+结构化转换指标
+- 每个文件一条 JSON Lines 事件（路径、大小、尺寸、模式、各阶段耗时、结果）
+- 运行结束时一条汇总事件
+- Prometheus textfile（供 node_exporter 的 textfile collector 采集）：计数器和各阶段耗时直方图
+记录只是把字典放入队列，序列化、统计和写文件都在后台线程完成，不拖慢转换主循环
+"""
+import json
+import os
+import queue
+import threading
+import time
+
+from webp_admission import WorkerPeakRss, total_peak_rss
+
+# 默认输出文件名（GUI导出到输出文件夹）
+EVENTS_FILE_NAME = "conversion_events.jsonl"
+PROM_FILE_NAME = "webp_to_png.prom"
+
+# 转换阶段
+STAGES = ("read", "decode", "process", "encode", "write")
+OUTCOMES = ("converted", "skipped", "failed")
+
+# 直方图分桶（秒）
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_STOP = object()
+
+
+class Histogram:
+    """累积分桶直方图"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class MetricsRecorder:
+    """
+    异步指标记录器
+    events_path 和 prom_path 都可以为None（不输出对应内容）
+    """
+
+    def __init__(self, events_path=None, prom_path=None, run_info=None):
+        self.events_path = events_path
+        self.prom_path = prom_path
+        self.run_info = dict(run_info or {})
+        self.started = time.time()
+
+        # 以下统计只在后台线程中修改
+        self.outcomes = dict.fromkeys(OUTCOMES, 0)
+        self.input_bytes = 0
+        self.output_bytes = 0
+        self.stage_seconds = {stage: Histogram() for stage in STAGES}
+        self.file_seconds = Histogram()
+        self.worker_rss = WorkerPeakRss()
+
+        self._queue = queue.SimpleQueue()
+        self._events_file = None
+        if events_path:
+            os.makedirs(os.path.dirname(os.path.abspath(events_path)), exist_ok=True)
+            self._events_file = open(events_path, 'a', encoding='utf-8', buffering=1024 * 1024)
+        self._thread = threading.Thread(target=self._drain, name='metrics', daemon=True)
+        self._thread.start()
+
+    def record_result(self, result):
+        """记录 run_conversion 产出的转换结果"""
+        self._queue.put(('file', time.time(), result))
+
+    def record_skip(self, input_path, output_path):
+        """记录跳过的文件"""
+        self._queue.put(('file', time.time(), {
+            'input_path': input_path,
+            'output_path': output_path,
+            'outcome': 'skipped',
+        }))
+
+    def record_failure(self, input_path, output_path, message):
+        """记录未进入转换流程就失败的文件"""
+        self._queue.put(('file', time.time(), {
+            'input_path': input_path,
+            'output_path': output_path,
+            'success': False,
+            'message': message,
+        }))
+
+    def _drain(self):
+        """后台线程：批量取出事件、更新统计并写入文件"""
+        while True:
+            items = [self._queue.get()]
+            try:
+                while True:
+                    items.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            lines = []
+            stop = False
+            for item in items:
+                if item is _STOP:
+                    stop = True
+                    continue
+                _, ts, result = item
+                event = self._file_event(ts, result)
+                if self._events_file:
+                    lines.append(json.dumps(event, ensure_ascii=False))
+            if lines:
+                self._events_file.write('\n'.join(lines) + '\n')
+            if stop:
+                return
+
+    def _file_event(self, ts, result):
+        """把转换结果整理为事件并计入统计"""
+        outcome = result.get('outcome')
+        if outcome is None:
+            outcome = 'converted' if result.get('success') else 'failed'
+
+        event = {
+            'type': 'file',
+            'ts': round(ts, 6),
+            'input_path': result.get('input_path'),
+            'output_path': result.get('output_path'),
+            'outcome': outcome,
+        }
+        for key in ('input_size', 'width', 'height', 'mode'):
+            if result.get(key) is not None:
+                event[key] = result[key]
+        if outcome == 'converted':
+            event['output_size'] = result.get('size', 0)
+        if outcome == 'failed':
+            event['message'] = result.get('message', '')
+
+        timings = result.get('timings')
+        if timings:
+            event['timings'] = {stage: round(seconds, 6) for stage, seconds in timings.items()}
+            for stage, seconds in timings.items():
+                if stage in self.stage_seconds:
+                    self.stage_seconds[stage].observe(seconds)
+            self.file_seconds.observe(sum(timings.values()))
+
+        self.worker_rss.add(result)
+        self.outcomes[outcome] += 1
+        self.input_bytes += result.get('input_size') or 0
+        if outcome == 'converted':
+            self.output_bytes += result.get('size', 0)
+        return event
+
+    def summary(self):
+        """运行汇总（需在 close 之后调用以保证统计完整）"""
+        finished = getattr(self, 'finished', time.time())
+        duration = finished - self.started
+        files = sum(self.outcomes.values())
+        summary = {
+            'type': 'run_summary',
+            'started': round(self.started, 6),
+            'finished': round(finished, 6),
+            'duration': round(duration, 6),
+            'files': files,
+            'input_bytes': self.input_bytes,
+            'output_bytes': self.output_bytes,
+            'files_per_second': round(self.outcomes['converted'] / duration, 3) if duration > 0 else 0,
+            'stage_seconds': {stage: round(h.sum, 6) for stage, h in self.stage_seconds.items()},
+        }
+        summary.update(self.outcomes)
+        summary['peak_rss_bytes'] = getattr(self, 'peak_rss_bytes', None)
+        summary.update(self.run_info)
+        return summary
+
+    def close(self):
+        """等待后台线程写完所有事件，写入汇总事件和Prometheus文件，返回汇总（重复调用时只返回汇总）"""
+        if hasattr(self, 'finished'):
+            return self.summary()
+        self._queue.put(_STOP)
+        self._thread.join()
+        self.finished = time.time()
+        # 进程池时包括各转换进程
+        self.peak_rss_bytes = total_peak_rss(self.worker_rss)
+
+        summary = self.summary()
+        if self._events_file:
+            self._events_file.write(json.dumps(summary, ensure_ascii=False) + '\n')
+            self._events_file.close()
+            self._events_file = None
+        if self.prom_path:
+            write_prometheus_textfile(self.prom_path, self)
+        return summary
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._thread.is_alive():
+            self.close()
+
+
+def _format_histogram(lines, name, labels, histogram):
+    """输出一个直方图的各行"""
+    prefix = ','.join(f'{k}="{v}"' for k, v in labels.items())
+    sep = ',' if prefix else ''
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        lines.append(f'{name}_bucket{{{prefix}{sep}le="{bound:g}"}} {count}')
+    lines.append(f'{name}_bucket{{{prefix}{sep}le="+Inf"}} {histogram.count}')
+    suffix = f'{{{prefix}}}' if prefix else ''
+    lines.append(f'{name}_sum{suffix} {histogram.sum:.6f}')
+    lines.append(f'{name}_count{suffix} {histogram.count}')
+
+
+def write_prometheus_textfile(path, recorder):
+    """按 Prometheus 文本格式原子写入指标文件"""
+    lines = [
+        '# HELP webp_to_png_files_total Files processed, by outcome.',
+        '# TYPE webp_to_png_files_total counter',
+    ]
+    for outcome, count in recorder.outcomes.items():
+        lines.append(f'webp_to_png_files_total{{outcome="{outcome}"}} {count}')
+
+    lines += [
+        '# HELP webp_to_png_input_bytes_total Bytes of WebP input read.',
+        '# TYPE webp_to_png_input_bytes_total counter',
+        f'webp_to_png_input_bytes_total {recorder.input_bytes}',
+        '# HELP webp_to_png_output_bytes_total Bytes of PNG output written.',
+        '# TYPE webp_to_png_output_bytes_total counter',
+        f'webp_to_png_output_bytes_total {recorder.output_bytes}',
+        '# HELP webp_to_png_stage_seconds Per-file latency of each conversion stage.',
+        '# TYPE webp_to_png_stage_seconds histogram',
+    ]
+    for stage, histogram in recorder.stage_seconds.items():
+        _format_histogram(lines, 'webp_to_png_stage_seconds', {'stage': stage}, histogram)
+
+    lines += [
+        '# HELP webp_to_png_file_seconds Per-file total conversion latency.',
+        '# TYPE webp_to_png_file_seconds histogram',
+    ]
+    _format_histogram(lines, 'webp_to_png_file_seconds', {}, recorder.file_seconds)
+
+    finished = getattr(recorder, 'finished', time.time())
+    lines += [
+        '# HELP webp_to_png_run_duration_seconds Wall time of the last run.',
+        '# TYPE webp_to_png_run_duration_seconds gauge',
+        f'webp_to_png_run_duration_seconds {finished - recorder.started:.6f}',
+        '# HELP webp_to_png_last_run_timestamp_seconds Finish time of the last run.',
+        '# TYPE webp_to_png_last_run_timestamp_seconds gauge',
+        f'webp_to_png_last_run_timestamp_seconds {finished:.3f}',
+    ]
+    rss = getattr(recorder, 'peak_rss_bytes', None)
+    if rss is not None:
+        lines += [
+            '# HELP webp_to_png_peak_rss_bytes Peak resident set size of the last run.',
+            '# TYPE webp_to_png_peak_rss_bytes gauge',
+            f'webp_to_png_peak_rss_bytes {rss}',
+        ]
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(temp_path, path)
@@ -0,0 +1,230 @@
+"""
+管道模式（非交互式命令行）
+- --stdin  从标准输入读取一个WebP，把PNG写到标准输出，不产生临时文件
+- -0/--null 从标准输入读取以NUL分隔的路径列表（如 find -print0），用并行转换池转换，
+            每个文件向标准输出写一行机器可读的结果
+不打印装饰性输出、不等待按键，错误信息写到标准错误；只导入转换所需的模块，启动快。
+退出码: 0 全部成功（或跳过），1 有文件失败，2 参数错误
+
+结果格式（--format tsv，默认）：状态 \\t 输入路径 \\t 输出路径 \\t 字节数或错误信息
+状态为 ok / skipped / error；路径中可能含有制表符或换行时请使用 --format json
+路径列表在后台线程中读取，生产者较慢时已完成的结果也会立即输出，不等待后续输入
+"""
+import argparse
+import io
+import json
+import os
+import queue
+import sys
+import threading
+
+from webp_converter_core import convert_source, run_conversion, DEFAULT_PREFETCH_MEMORY_MB
+from webp_prefetch import DEFAULT_PREFETCH_DEPTH, PATH_PENDING, PATH_POLL_INTERVAL
+from webp_admission import default_workers, DEFAULT_MEMORY_BUDGET_MB
+from webp_color import COLOR_MODES
+
+STATUS_OK = "ok"
+STATUS_SKIPPED = "skipped"
+STATUS_ERROR = "error"
+
+# 读取路径列表的块大小
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def read_null_paths(stream):
+    """
+    逐个产出以NUL分隔的路径（按文件系统编码解码，忽略空项）
+    使用 read1：管道中有数据就返回，不等待凑满一个块
+    """
+    read = getattr(stream, 'read1', stream.read)
+    tail = b''
+    while True:
+        chunk = read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        parts = (tail + chunk).split(b'\0')
+        tail = parts.pop()
+        for part in parts:
+            if part:
+                yield os.fsdecode(part)
+    if tail:
+        yield os.fsdecode(tail)
+
+
+def background_paths(paths):
+    """
+    在后台线程中遍历 paths（如从标准输入读取），经队列逐个产出；
+    暂时没有新路径时产出 PATH_PENDING，转换流程借此先输出已完成的结果
+    读取时的异常在产出端重新抛出
+    """
+    items = queue.Queue()
+    end = object()
+
+    def pump():
+        try:
+            for path in paths:
+                items.put(path)
+        except BaseException as e:
+            items.put(e)
+        finally:
+            items.put(end)
+
+    threading.Thread(target=pump, name='path-reader', daemon=True).start()
+    while True:
+        try:
+            item = items.get(timeout=PATH_POLL_INTERVAL)
+        except queue.Empty:
+            yield PATH_PENDING
+            continue
+        if item is end:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+
+def output_path_for(input_path, output_dir=None):
+    """输出路径：指定输出文件夹时平铺到该文件夹，否则与源文件放在一起"""
+    png_filename = f"{os.path.splitext(os.path.basename(input_path))[0]}.png"
+    directory = output_dir if output_dir is not None else os.path.dirname(input_path)
+    return os.path.join(directory, png_filename)
+
+
+class ResultWriter:
+    """向标准输出写机器可读的结果，每条记录写完立即刷新，便于下游逐行处理"""
+
+    def __init__(self, stream, fmt="tsv"):
+        self.stream = stream
+        self.format = fmt
+
+    def write(self, status, input_path, output_path, detail):
+        if self.format == "json":
+            record = {'status': status, 'input': input_path, 'output': output_path}
+            record['size' if status == STATUS_OK else 'message'] = detail
+            line = json.dumps(record, ensure_ascii=False)
+        else:
+            detail = str(detail).replace('\t', ' ').replace('\n', ' ')
+            line = f"{status}\t{input_path}\t{output_path}\t{detail}"
+        self.stream.write(line + '\n')
+        self.stream.flush()
+
+
+def convert_stream(options):
+    """标准输入的WebP → 标准输出的PNG"""
+    if sys.stdout.isatty():
+        print("错误: 标准输出是终端，请重定向到文件或管道", file=sys.stderr)
+        return 2
+    data = sys.stdin.buffer.read()
+    try:
+        buffer, _ = convert_source(io.BytesIO(data), options)
+    except Exception as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return 1
+    sys.stdout.buffer.write(buffer.getbuffer())
+    sys.stdout.buffer.flush()
+    return 0
+
+
+def convert_paths(paths, options, writer, output_dir=None):
+    """
+    转换路径列表（可以是边读边产生的生成器，可以产出 PATH_PENDING），返回失败的文件数
+    已存在的输出默认跳过；多个源映射到同一个输出路径时只转换第一个
+    """
+    failed = 0
+    claimed = set()
+
+    def jobs():
+        nonlocal failed
+        for input_path in paths:
+            if input_path is PATH_PENDING:
+                yield input_path
+                continue
+            output_path = output_path_for(input_path, output_dir)
+            if output_path in claimed:
+                writer.write(STATUS_ERROR, input_path, output_path, "输出路径与之前的文件冲突")
+                failed += 1
+                continue
+            claimed.add(output_path)
+            if not options.get('overwrite') and os.path.exists(output_path):
+                writer.write(STATUS_SKIPPED, input_path, output_path, "文件已存在")
+                continue
+            yield input_path, output_path
+
+    for result in run_conversion(jobs(), options):
+        if result['success']:
+            writer.write(STATUS_OK, result['input_path'], result['output_path'], result['size'])
+        else:
+            writer.write(STATUS_ERROR, result['input_path'], result['output_path'],
+                         result['message'])
+            failed += 1
+    return failed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="webp_pipe", description="WebP转PNG（管道模式）")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--stdin", action="store_true",
+                      help="从标准输入读取一个WebP，PNG写到标准输出")
+    mode.add_argument("-0", "--null", action="store_true",
+                      help="从标准输入读取以NUL分隔的路径列表（find -print0）并转换")
+    parser.add_argument("-o", "--output-dir", default=None,
+                        help="输出文件夹（默认与源文件放在一起）")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="覆盖已存在的输出文件")
+    parser.add_argument("--format", choices=("tsv", "json"), default="tsv",
+                        help="结果格式: tsv（默认）或 json（每行一个JSON对象）")
+    parser.add_argument("--compress-level", type=int, choices=range(10), default=None,
+                        metavar="0-9", help="PNG压缩级别（默认由Pillow决定）")
+    parser.add_argument("--flatten-alpha", action="store_true",
+                        help="把透明通道合并到白色背景上")
+    parser.add_argument("--color", choices=COLOR_MODES, default="keep",
+                        help="色彩管理: keep 保留ICC/EXIF（默认）、srgb 转换为sRGB")
+    parser.add_argument("-j", "--workers", type=int, default=default_workers(),
+                        help="并行转换线程数（默认为CPU核心数）")
+    parser.add_argument("--memory-budget", type=int, default=DEFAULT_MEMORY_BUDGET_MB,
+                        help=f"同时解码的图片内存预算，单位MB（默认 {DEFAULT_MEMORY_BUDGET_MB}）")
+    parser.add_argument("--prefetch-depth", type=int, default=DEFAULT_PREFETCH_DEPTH,
+                        help=f"预读文件数（默认 {DEFAULT_PREFETCH_DEPTH}）")
+    parser.add_argument("--prefetch-memory", type=int, default=DEFAULT_PREFETCH_MEMORY_MB,
+                        help=f"预读/写入缓冲内存上限，单位MB（默认 {DEFAULT_PREFETCH_MEMORY_MB}）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """返回退出码"""
+    args = parse_args(argv)
+    options = {
+        'overwrite': args.overwrite,
+        'flatten_alpha': args.flatten_alpha,
+        'color_mode': args.color,
+        'workers': args.workers,
+        'memory_budget_mb': args.memory_budget,
+        'prefetch_depth': args.prefetch_depth,
+        'prefetch_memory_mb': args.prefetch_memory,
+    }
+    if args.compress_level is not None:
+        options['compress_level'] = args.compress_level
+
+    try:
+        if args.stdin:
+            return convert_stream(options)
+
+        if args.output_dir is not None:
+            os.makedirs(args.output_dir, exist_ok=True)
+        # 无法解码的文件名（surrogateescape）按原始字节输出
+        sys.stdout.reconfigure(errors='surrogateescape')
+        writer = ResultWriter(sys.stdout, args.format)
+        paths = background_paths(read_null_paths(sys.stdin.buffer))
+        failed = convert_paths(paths, options, writer, args.output_dir)
+        return 1 if failed else 0
+    except BrokenPipeError:
+        # 下游已关闭（如 | head），不再输出
+        sys.stdout = open(os.devnull, 'w')
+        return 1
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
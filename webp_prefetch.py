@@ -0,0 +1,244 @@
+"""
+预读 / 缓冲写入 I/O 阶段
+在转换线程前后各放一个小型 I/O 线程池：
+读取端提前把后续文件读入内存，写入端在后台落盘，
+使网络存储和机械硬盘上的 I/O 与解码、编码重叠进行
+"""
+import io
+import mmap
+import os
+import socket
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+MB = 1024 * 1024
+
+# 默认参数
+DEFAULT_PREFETCH_DEPTH = 8
+DEFAULT_MEMORY_BUDGET = 256 * MB
+DEFAULT_IO_WORKERS = 4
+# 超过该大小的文件使用内存映射读取
+DEFAULT_MMAP_THRESHOLD = 4 * MB
+# 预热页缓存时使用的分块大小
+_WARM_CHUNK = 1 * MB
+
+# 路径来源暂时没有新路径（如管道另一端的生产者较慢）时产出的占位值；
+# 预读器和转换流程收到后不再阻塞等待输入，先处理已完成的文件，稍后再取
+PATH_PENDING = object()
+# 等待新路径时的轮询间隔（秒）
+PATH_POLL_INTERVAL = 0.05
+
+_scratch = threading.local()
+
+# 临时文件名中的主机标识，多台机器写同一个共享文件夹时临时文件互不相同
+_HOST_TAG = f"{zlib.crc32(socket.gethostname().encode('utf-8')):08x}"
+
+
+def _warm_page_cache(f, size):
+    """
+    把文件内容读入系统页缓存
+    readinto 读取期间会释放GIL，读到线程私有的复用缓冲区中，不产生新的分配
+    """
+    buffer = getattr(_scratch, 'buffer', None)
+    if buffer is None:
+        buffer = _scratch.buffer = memoryview(bytearray(_WARM_CHUNK))
+    remaining = size
+    while remaining > 0:
+        n = f.readinto(buffer)
+        if not n:
+            break
+        remaining -= n
+
+
+def read_file(path, mmap_threshold=DEFAULT_MMAP_THRESHOLD):
+    """
+    读取单个文件，返回可直接交给 Image.open 的文件对象
+    小文件整体读入后包装为 BytesIO（与bytes共享内存，不复制）；
+    大文件先预热页缓存，再以只读方式内存映射
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < mmap_threshold or size == 0:
+            return io.BytesIO(f.read())
+
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        _warm_page_cache(f, size)
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _timed_read(path, mmap_threshold):
+    """读取文件并记录耗时"""
+    start = time.perf_counter()
+    source = read_file(path, mmap_threshold)
+    return source, time.perf_counter() - start
+
+
+class ReadAhead:
+    """
+    按顺序预读文件
+    同时在途的文件数不超过 depth，在途字节数不超过 memory_budget
+    （单个超出预算的文件仍会被读取，保证不会卡死）
+    迭代得到 (路径, 文件对象, 异常, 读取耗时)，读取失败时文件对象为None
+    使用者在处理完后应关闭文件对象
+    路径来源产出 PATH_PENDING 且没有在途的读取时，迭代同样产出 PATH_PENDING
+    """
+
+    def __init__(self, paths, depth=DEFAULT_PREFETCH_DEPTH, memory_budget=DEFAULT_MEMORY_BUDGET,
+                 io_workers=DEFAULT_IO_WORKERS, mmap_threshold=DEFAULT_MMAP_THRESHOLD):
+        self._paths = iter(paths)
+        self._depth = max(1, depth)
+        self._memory_budget = memory_budget
+        self._mmap_threshold = mmap_threshold
+        self._executor = ThreadPoolExecutor(max_workers=max(1, io_workers),
+                                            thread_name_prefix='prefetch')
+        self._pending = deque()  # (路径, 预计字节数, Future)
+        self._held = None  # 因预算不足暂未提交的 (路径, 字节数)
+        self._in_flight = 0
+        self._last_size = 0
+        self._starved = False
+
+    def _next_path(self):
+        """取下一个待读路径及其大小"""
+        if self._held is not None:
+            item, self._held = self._held, None
+            return item
+        path = next(self._paths, None)
+        if path is None or path is PATH_PENDING:
+            return path
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        return path, size
+
+    def _fill(self):
+        """在深度和内存预算允许的范围内提交读取任务"""
+        while len(self._pending) < self._depth:
+            item = self._next_path()
+            if item is None:
+                return
+            if item is PATH_PENDING:
+                self._starved = True
+                return
+            path, size = item
+            if self._pending and self._in_flight + size > self._memory_budget:
+                self._held = item
+                return
+            self._in_flight += size
+            future = self._executor.submit(_timed_read, path, self._mmap_threshold)
+            self._pending.append((path, size, future))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        # 上一个文件已交给使用者处理完毕，释放其预算
+        self._in_flight -= self._last_size
+        self._last_size = 0
+
+        self._fill()
+        if not self._pending:
+            if self._starved:
+                self._starved = False
+                return PATH_PENDING
+            self.close()
+            raise StopIteration
+
+        path, size, future = self._pending.popleft()
+        self._last_size = size
+        self._fill()
+
+        try:
+            source, seconds = future.result()
+            return path, source, None, seconds
+        except Exception as e:
+            return path, None, e, 0.0
+
+    def close(self):
+        """停止预读并关闭尚未取走的文件"""
+        while self._pending:
+            _, _, future = self._pending.popleft()
+            future.cancel()
+            if not future.cancelled() and future.exception() is None:
+                future.result()[0].close()
+        self._executor.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _temp_path(path):
+    """每个写入者（主机、进程、线程）使用各自的临时文件，同时写同一个输出时不会互相破坏"""
+    return f"{path}.{_HOST_TAG}-{os.getpid()}-{threading.get_ident()}.part"
+
+
+def write_file(path, buffer, before_commit=None):
+    """
+    把 BytesIO 中的数据写入文件
+    先写临时文件再原子替换，避免中断时留下不完整的PNG
+    before_commit 在替换为正式文件前调用，返回False时删除临时文件并抛出 InterruptedError
+    （例如集群模式下租约已被其他节点接管）
+    返回写入耗时（秒）
+    """
+    start = time.perf_counter()
+    temp_path = _temp_path(path)
+    try:
+        with buffer.getbuffer() as view, open(temp_path, 'wb') as f:
+            f.write(view)
+        if before_commit is not None and not before_commit():
+            raise InterruptedError("写入已取消")
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return time.perf_counter() - start
+
+
+class BufferedWriter:
+    """
+    后台写入
+    write() 立即返回 Future；待写入字节数超过 memory_budget 时阻塞，
+    直到已有写入完成，避免编码速度远快于磁盘时内存无限增长
+    """
+
+    def __init__(self, memory_budget=DEFAULT_MEMORY_BUDGET, io_workers=DEFAULT_IO_WORKERS):
+        self._memory_budget = memory_budget
+        self._executor = ThreadPoolExecutor(max_workers=max(1, io_workers),
+                                            thread_name_prefix='writer')
+        self._condition = threading.Condition()
+        self._pending_bytes = 0
+
+    def write(self, path, buffer, before_commit=None):
+        """提交一次写入（before_commit 见 write_file）"""
+        size = buffer.getbuffer().nbytes
+        with self._condition:
+            while self._pending_bytes and self._pending_bytes + size > self._memory_budget:
+                self._condition.wait()
+            self._pending_bytes += size
+
+        future = self._executor.submit(write_file, path, buffer, before_commit)
+        future.add_done_callback(lambda _: self._release(size))
+        return future
+
+    def _release(self, size):
+        with self._condition:
+            self._pending_bytes -= size
+            self._condition.notify_all()
+
+    def close(self):
+        """等待所有写入完成"""
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
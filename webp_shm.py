@@ -0,0 +1,157 @@
+"""
+共享内存传输
+进程池中各阶段之间不再 pickle 整块数据，而是放在 multiprocessing.shared_memory 的内存块（slab）中，
+只传递 (名称, 长度) 这样的小句柄：
+- 内存块按容量分级（2的幂）回收复用，长时间运行时不反复创建/销毁共享内存
+- 子进程按名称映射内存块并缓存映射，复用的内存块只映射一次
+- 编码得到的PNG直接写入主进程预先分配的内存块，主进程从内存块写盘，结果不经过 pickle
+内存块只由主进程创建和释放（unlink）；子进程只映射、不释放
+"""
+import threading
+from collections import OrderedDict, namedtuple
+from multiprocessing import shared_memory
+
+MB = 1024 * 1024
+
+# 最小的内存块容量
+MIN_SLAB_SIZE = 1 * MB
+# 空闲内存块总容量超过该值时，归还的内存块直接释放
+DEFAULT_MAX_IDLE_BYTES = 512 * MB
+# 子进程中缓存的映射数
+ATTACH_CACHE_SIZE = 64
+
+SlabHandle = namedtuple('SlabHandle', 'name length')
+
+
+def _slab_capacity(nbytes):
+    """按2的幂分级，使不同大小的图片可以复用同一级内存块"""
+    capacity = MIN_SLAB_SIZE
+    while capacity < nbytes:
+        capacity *= 2
+    return capacity
+
+
+class SlabPool:
+    """
+    主进程中的共享内存块池（线程安全）
+    acquire 取出容量不小于请求字节数的内存块，release 归还以便复用
+    """
+
+    def __init__(self, max_idle_bytes=DEFAULT_MAX_IDLE_BYTES):
+        self.max_idle_bytes = max_idle_bytes
+        self._lock = threading.Lock()
+        self._free = {}  # 容量 -> [SharedMemory]
+        self._idle_bytes = 0
+        self._slabs = {}  # 名称 -> SharedMemory（包括使用中的）
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self, nbytes):
+        capacity = _slab_capacity(nbytes)
+        with self._lock:
+            free = self._free.get(capacity)
+            if free:
+                self._idle_bytes -= capacity
+                self.reused += 1
+                return free.pop()
+        slab = shared_memory.SharedMemory(create=True, size=capacity)
+        with self._lock:
+            self._slabs[slab.name] = slab
+            self.created += 1
+        return slab
+
+    def release(self, slab):
+        capacity = _slab_capacity(slab.size)
+        with self._lock:
+            if slab.name not in self._slabs:
+                return
+            if self._idle_bytes + capacity <= self.max_idle_bytes:
+                self._free.setdefault(capacity, []).append(slab)
+                self._idle_bytes += capacity
+                return
+            del self._slabs[slab.name]
+        _destroy(slab)
+
+    def close(self):
+        """释放所有内存块"""
+        with self._lock:
+            slabs = list(self._slabs.values())
+            self._slabs.clear()
+            self._free.clear()
+            self._idle_bytes = 0
+        for slab in slabs:
+            _destroy(slab)
+
+
+def _destroy(slab):
+    try:
+        slab.close()
+    except BufferError:
+        # 仍有视图引用该内存块时，映射随视图一起释放
+        pass
+    slab.unlink()
+
+
+class _AttachCache:
+    """子进程中按名称缓存的映射（LRU），复用的内存块不重复映射"""
+
+    def __init__(self, size=ATTACH_CACHE_SIZE):
+        self.size = size
+        self._slabs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            slab = self._slabs.get(name)
+            if slab is not None:
+                self._slabs.move_to_end(name)
+                return slab
+            slab = self._slabs[name] = shared_memory.SharedMemory(name=name)
+            while len(self._slabs) > self.size:
+                _, old = self._slabs.popitem(last=False)
+                try:
+                    old.close()
+                except BufferError:
+                    pass
+            return slab
+
+
+_attached = _AttachCache()
+
+
+def attach(name):
+    """按名称映射内存块（主进程中创建的内存块也可以这样取得）"""
+    return _attached.get(name)
+
+
+def write_slab(slab, data):
+    """把缓冲区（bytes / memoryview / mmap 等）复制到内存块开头，返回句柄"""
+    with memoryview(data) as view:
+        length = view.nbytes
+        slab.buf[:length] = view.cast('B')
+    return SlabHandle(slab.name, length)
+
+
+def slab_view(handle):
+    """句柄对应的数据视图（memoryview，不复制）；使用完应调用 release()"""
+    return attach(handle.name).buf[:handle.length]
+
+
+class SlabBuffer:
+    """
+    把内存块中的一段数据包装成带 getbuffer() 的缓冲区，可直接交给 BufferedWriter
+    close() 时把内存块还给池
+    """
+
+    def __init__(self, pool, slab, length):
+        self._pool = pool
+        self._slab = slab
+        self._length = length
+
+    def getbuffer(self):
+        return self._slab.buf[:self._length]
+
+    def close(self):
+        if self._slab is not None:
+            self._pool.release(self._slab)
+            self._slab = None
@@ -4,20 +4,129 @@ WebP转PNG转换器
 """
 import sys
 import os
-from PIL import Image
+import argparse
+import multiprocessing
 
+from webp_converter_core import (find_webp_files, run_conversion, ConversionPool,
+                                 OUTPUT_FOLDER_NAME, DEFAULT_PREFETCH_MEMORY_MB, BACKENDS)
+from webp_prefetch import DEFAULT_PREFETCH_DEPTH
+from webp_admission import (WorkerPeakRss, total_peak_rss, reset_peak_rss, default_workers,
+                            DEFAULT_MEMORY_BUDGET_MB)
+from webp_color import COLOR_MODES
+# 集群、指标、布局、校验和自动调优模块在用到时才导入，管道模式（--pipe）启动时不加载
 
-def convert_webp_to_png():
+
+def convert_files(filenames, layout, options, should_stop=None, metrics=None, index=None,
+                  before_commit=None, pool=None, worker_rss=None):
     """
-    转换当前目录下的所有WebP文件为PNG格式
+    转换一组文件并逐个打印结果
+    layout 决定输出路径；metrics 不为None时记录指标事件；index 不为None时记录源→输出映射；
+    before_commit 返回False时放弃尚未落盘的输出（集群模式下租约被接管）；
+    pool 为多次调用共用的转换池；worker_rss 不为None时汇总转换进程的峰值内存
+    返回 (成功数, 跳过数, 失败数)
     """
+    success_count = 0
+    skip_count = 0
+    error_count = 0
+
+    # 检查已存在的文件，其余交给转换流程
+    jobs = []
+    sources = {}
+    for filename in filenames:
+        # 完整的文件路径
+        input_path = os.path.join(layout.input_folder, filename)
+
+        # 生成输出路径
+        try:
+            output_path = layout.output_path(filename)
+        except ValueError as e:
+            print(f"❌ 转换失败 {filename}: {e}")
+            error_count += 1
+            if metrics:
+                metrics.record_failure(input_path, None, str(e))
+            continue
+        png_filename = os.path.relpath(output_path, layout.output_folder)
+
+        # 检查文件是否已存在
+        if os.path.exists(output_path):
+            print(f"⚠️  跳过: {filename} → {png_filename} (文件已存在)")
+            skip_count += 1
+            if metrics:
+                metrics.record_skip(input_path, output_path)
+            continue
+
+        jobs.append((input_path, output_path))
+        sources[input_path] = filename
+
+    # 转换每个.webp文件（后台预读输入、缓冲写入输出）
+    for result in run_conversion(jobs, options, should_stop, pool=pool,
+                                 before_commit=before_commit):
+        filename = sources[result['input_path']]
+        if worker_rss is not None:
+            worker_rss.add(result)
+        png_filename = os.path.relpath(result['output_path'], layout.output_folder)
+        if metrics:
+            metrics.record_result(result)
+        if result['success']:
+            if index:
+                index.add(filename, png_filename)
+            print(f"✅ 已转换: {filename} → {png_filename}")
+            success_count += 1
+        else:
+            print(f"❌ 转换失败 {filename}: {result['message']}")
+            error_count += 1
+
+    return success_count, skip_count, error_count
+
+
+def verify_files(filenames, layout, options):
+    """
+    校验输出并打印不一致的文件
+    返回 (一致数, 其中来自缓存的数量, 问题数)
+    """
+    from webp_verify import verify_outputs, STATUS_OK, STATUS_NAMES
+
+    pairs = [(os.path.join(layout.input_folder, filename), layout.existing_output(filename))
+             for filename in filenames]
+
+    ok_count = 0
+    cached_count = 0
+    problem_count = 0
+    for result in verify_outputs(pairs, options, layout.output_folder):
+        if result['status'] == STATUS_OK:
+            ok_count += 1
+            cached_count += result['cached']
+        else:
+            problem_count += 1
+            filename = os.path.relpath(result['input_path'], layout.input_folder)
+            print(f"❌ 校验失败 {filename}: {STATUS_NAMES[result['status']]} {result['message']}")
+
+    return ok_count, cached_count, problem_count
+
+
+def convert_webp_to_png(folder=None, options=None):
+    """
+    转换当前目录（或指定目录）下的所有WebP文件为PNG格式
+    """
+    from webp_cluster import (ClusterCoordinator, CLUSTER_DIR_NAME, DEFAULT_LEASE_TIMEOUT,
+                              DEFAULT_BATCH_COUNT)
+    from webp_metrics import MetricsRecorder
+    from webp_layout import OutputLayout, OutputIndex
+    from webp_autotune import tuned_options
+
+    options = dict(options or {})
+    metrics = None
+    index = None
+    pool = None
     try:
         print("=" * 50)
         print("    WebP 转 PNG 转换器")
         print("=" * 50)
 
         # 获取当前程序所在目录
-        if getattr(sys, 'frozen', False):
+        if folder:
+            current_folder = os.path.abspath(folder)
+        elif getattr(sys, 'frozen', False):
             # 如果被打包成exe
             current_folder = os.path.dirname(sys.executable)
         else:
@@ -27,16 +136,14 @@ def convert_webp_to_png():
         print(f"当前目录: {current_folder}")
 
         # 创建输出文件夹
-        output_folder = os.path.join(current_folder, "PNG_转换结果")
+        output_folder = os.path.join(current_folder, OUTPUT_FOLDER_NAME)
         if not os.path.exists(output_folder):
             os.makedirs(output_folder)
             print(f"已创建输出文件夹: {output_folder}")
 
         # 查找所有.webp文件（不区分大小写）
-        webp_files = []
-        for filename in os.listdir(current_folder):
-            if filename.lower().endswith(".webp"):
-                webp_files.append(filename)
+        webp_files = find_webp_files(current_folder, recursive=options.get('recursive', False),
+                                     exclude=[output_folder])
 
         if not webp_files:
             print("\n❌ 未找到任何.webp文件！")
@@ -47,41 +154,83 @@ def convert_webp_to_png():
         for i, file in enumerate(webp_files, 1):
             print(f"  {i}. {file}")
 
+        # 自动调优：沿用本机该文件夹保存的配置，没有时先在样本上校准
+        if options.get('auto_tune') and not options.get('verify_only'):
+            print()
+            options.update(tuned_options(
+                current_folder, [os.path.join(current_folder, f) for f in webp_files], options,
+                options['auto_tune'], scratch_parent=output_folder,
+                retune=options.get('retune', False), log=print))
+
         print("\n开始转换...")
         print("-" * 50)
 
-        success_count = 0
-        skip_count = 0
-        error_count = 0
+        reset_peak_rss()
+
+        # 结构化指标（JSON Lines 事件 / Prometheus textfile）
+        metrics = None
+        if options.get('events_path') or options.get('prom_path'):
+            metrics = MetricsRecorder(options.get('events_path'), options.get('prom_path'),
+                                      run_info={'input_folder': current_folder})
 
-        # 转换每个.webp文件
-        for filename in webp_files:
-            try:
-                # 完整的文件路径
-                input_path = os.path.join(current_folder, filename)
+        # 输出布局（平铺 / 镜像 / 哈希分片 / 日期分片），非平铺布局维护映射索引
+        layout = OutputLayout(current_folder, output_folder, options.get('layout', 'flat'))
+        layout.plan(webp_files)
+        index = None
 
-                # 生成输出文件名
-                base_name = os.path.splitext(filename)[0]
-                png_filename = f"{base_name}.png"
-                output_path = os.path.join(output_folder, png_filename)
+        # 各批次共用一个转换池，进程池的转换进程不随批次重建，峰值内存可按进程号汇总
+        pool = ConversionPool.from_options(options)
+        worker_rss = WorkerPeakRss()
 
-                # 检查文件是否已存在
-                if os.path.exists(output_path):
-                    print(f"⚠️  跳过: {filename} → {png_filename} (文件已存在)")
-                    skip_count += 1
-                    continue
+        if options.get('verify_only'):
+            success_count = skip_count = error_count = 0
+        elif options.get('cluster'):
+            # 集群模式：与其他节点通过租约文件分批认领
+            success_count = skip_count = error_count = 0
+            coordinator = ClusterCoordinator(
+                os.path.join(output_folder, CLUSTER_DIR_NAME),
+                node_id=options.get('node_id'),
+                lease_timeout=options.get('lease_timeout', DEFAULT_LEASE_TIMEOUT),
+                batch_count=options.get('batch_count', DEFAULT_BATCH_COUNT),
+            )
+            print(f"集群模式，节点ID: {coordinator.node_id}")
+            if layout.layout != 'flat':
+                index = OutputIndex(output_folder, node_id=coordinator.node_id)
+            with coordinator:
+                for batch in coordinator.batches(webp_files):
+                    print(f"🔒 已认领批次 {batch.bucket}（{len(batch.files)} 个文件）")
+                    counts = convert_files(batch.files, layout, options,
+                                           should_stop=lambda: batch.lost, metrics=metrics,
+                                           index=index, before_commit=batch.still_held,
+                                           pool=pool, worker_rss=worker_rss)
+                    success_count += counts[0]
+                    skip_count += counts[1]
+                    error_count += counts[2]
+                    if batch.lost:
+                        print(f"⚠️  批次 {batch.bucket} 的租约已被其他节点接管")
+                    else:
+                        batch.complete()
+        else:
+            if layout.layout != 'flat':
+                index = OutputIndex(output_folder)
+            success_count, skip_count, error_count = convert_files(
+                webp_files, layout, options, metrics=metrics, index=index, pool=pool,
+                worker_rss=worker_rss)
 
-                # 打开并转换图片
-                with Image.open(input_path) as img:
-                    # 保存为PNG格式
-                    img.save(output_path, format="PNG", optimize=True)
+        if index:
+            index.close()
+            index = None
 
-                print(f"✅ 已转换: {filename} → {png_filename}")
-                success_count += 1
+        # 校验输出
+        verify_counts = None
+        if options.get('verify') or options.get('verify_only'):
+            fraction = options.get('verify_sample', 1.0)
+            print(f"\n开始校验输出{f'（抽样 {fraction:.0%}）' if fraction < 1.0 else ''}...")
+            verify_counts = verify_files(webp_files, layout, options)
 
-            except Exception as e:
-                print(f"❌ 转换失败 {filename}: {str(e)}")
-                error_count += 1
+        if metrics:
+            summary = metrics.close()
+            print(f"📊 指标: {summary['files_per_second']} 文件/秒，用时 {summary['duration']:.2f} 秒")
 
         # 显示转换结果
         print("\n" + "=" * 50)
@@ -92,7 +241,18 @@ def convert_webp_to_png():
             print(f"⚠️  跳过: {skip_count} 个文件（已存在）")
         if error_count > 0:
             print(f"❌ 转换失败: {error_count} 个文件")
+        if verify_counts:
+            ok_count, cached_count, problem_count = verify_counts
+            print(f"🔍 校验一致: {ok_count} 个文件（其中 {cached_count} 个未变化，沿用上次结果）")
+            if problem_count > 0:
+                print(f"❌ 校验失败: {problem_count} 个文件")
         print("-" * 50)
+        rss = total_peak_rss(worker_rss)
+        if rss is not None:
+            workers_rss = worker_rss.total()
+            detail = f"，其中转换进程 {workers_rss / 1024 / 1024:.0f} MB" if workers_rss else ""
+            print(f"🧠 峰值内存: {rss / 1024 / 1024:.0f} MB（内存预算 "
+                  f"{options.get('memory_budget_mb', DEFAULT_MEMORY_BUDGET_MB)} MB{detail}）")
         print(f"📁 PNG文件保存在: {output_folder}")
         print("=" * 50)
 
@@ -100,15 +260,106 @@ def convert_webp_to_png():
         print(f"\n❌ 程序运行出错: {str(e)}")
 
     finally:
+        # 出错时同样写出已记录的索引、事件和指标
+        if index:
+            index.close()
+        if metrics:
+            metrics.close()
+        if pool:
+            pool.shutdown()
         # 如果是exe运行，等待用户按键退出
         if getattr(sys, 'frozen', False):
             input("\n按回车键退出程序...")
 
 
+def parse_args(argv=None):
+    """解析命令行参数（不带参数时与双击运行行为一致）"""
+    from webp_cluster import DEFAULT_LEASE_TIMEOUT, DEFAULT_BATCH_COUNT
+    from webp_layout import LAYOUTS
+    from webp_autotune import OBJECTIVES
+
+    parser = argparse.ArgumentParser(
+        description="WebP转PNG转换器",
+        epilog="管道模式: webp_to_png_converter --pipe --stdin | -0 ...（详见 --pipe --help）")
+    parser.add_argument("folder", nargs="?", default=None,
+                        help="包含.webp文件的文件夹（默认为程序所在目录）")
+    parser.add_argument("--prefetch-depth", type=int, default=DEFAULT_PREFETCH_DEPTH,
+                        help=f"预读文件数（默认 {DEFAULT_PREFETCH_DEPTH}）")
+    parser.add_argument("--prefetch-memory", type=int, default=DEFAULT_PREFETCH_MEMORY_MB,
+                        help=f"预读/写入缓冲内存上限，单位MB（默认 {DEFAULT_PREFETCH_MEMORY_MB}）")
+    parser.add_argument("-j", "--workers", type=int, default=default_workers(),
+                        help="并行转换线程数（默认为CPU核心数）")
+    parser.add_argument("--memory-budget", type=int, default=DEFAULT_MEMORY_BUDGET_MB,
+                        help=f"同时解码的图片内存预算，单位MB（默认 {DEFAULT_MEMORY_BUDGET_MB}）")
+    parser.add_argument("--backend", choices=BACKENDS, default="thread",
+                        help="转换池类型: thread 线程池（默认）、process 进程池")
+    parser.add_argument("--auto-tune", choices=OBJECTIVES, default=None,
+                        help="自动调优线程数、池类型和PNG编码设置: fastest 最快、smallest 最小、"
+                             "balanced 均衡（结果按本机和文件夹保存，之后直接沿用）")
+    parser.add_argument("--retune", action="store_true",
+                        help="忽略保存的调优结果，重新校准")
+    parser.add_argument("--layout", choices=LAYOUTS, default="flat",
+                        help="输出布局: flat 平铺（默认）、mirror 镜像输入目录、"
+                             "hash 按哈希分片（ab/cd/name.png）、date 按修改日期分片")
+    parser.add_argument("--color", choices=COLOR_MODES, default="keep",
+                        help="色彩管理: keep 保留ICC配置文件和EXIF（默认）、"
+                             "srgb 按ICC配置文件转换为sRGB")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="包含子文件夹中的.webp文件")
+    parser.add_argument("--verify", action="store_true",
+                        help="转换后逐像素校验输出（考虑透明通道处理）")
+    parser.add_argument("--verify-only", action="store_true",
+                        help="只校验已有输出，不转换")
+    parser.add_argument("--verify-sample", type=float, default=1.0,
+                        help="快速校验：只抽查该比例的文件（0~1，默认 1 即全部）")
+    parser.add_argument("--cluster", action="store_true",
+                        help="集群模式：多个节点共享输出文件夹，按批次认领工作")
+    parser.add_argument("--node-id", default=None,
+                        help="集群节点ID（默认 主机名-进程号）")
+    parser.add_argument("--lease-timeout", type=float, default=DEFAULT_LEASE_TIMEOUT,
+                        help=f"租约超时秒数，超时未续租的批次会被其他节点接管（默认 {DEFAULT_LEASE_TIMEOUT:g}）")
+    parser.add_argument("--batch-count", type=int, default=DEFAULT_BATCH_COUNT,
+                        help=f"集群模式下的批次数量（默认 {DEFAULT_BATCH_COUNT}）")
+    parser.add_argument("--events", default=None,
+                        help="把每个文件的转换事件以 JSON Lines 追加写入该文件")
+    parser.add_argument("--prom-file", default=None,
+                        help="运行结束后写入 Prometheus textfile 格式的指标")
+    return parser.parse_args(argv)
+
+
 def main():
     """主函数"""
-    convert_webp_to_png()
+    # 管道模式（--pipe 后的参数见 webp_pipe.py），不打印装饰性输出、不等待按键
+    if sys.argv[1:2] == ['--pipe']:
+        from webp_pipe import main as pipe_main
+        sys.exit(pipe_main(sys.argv[2:]))
+
+    args = parse_args()
+    options = {
+        'prefetch_depth': args.prefetch_depth,
+        'prefetch_memory_mb': args.prefetch_memory,
+        'workers': args.workers,
+        'memory_budget_mb': args.memory_budget,
+        'backend': args.backend,
+        'auto_tune': args.auto_tune,
+        'retune': args.retune,
+        'layout': args.layout,
+        'color_mode': args.color,
+        'recursive': args.recursive,
+        'verify': args.verify,
+        'verify_only': args.verify_only,
+        'verify_sample': args.verify_sample,
+        'cluster': args.cluster,
+        'node_id': args.node_id,
+        'lease_timeout': args.lease_timeout,
+        'batch_count': args.batch_count,
+        'events_path': args.events,
+        'prom_path': args.prom_file,
+    }
+    convert_webp_to_png(args.folder, options)
 
 
 if __name__ == "__main__":
+    # 打包为exe时进程池的子进程需要
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -5,16 +5,32 @@ WebP转PNG转换器 - PyQt5 稳定版
 """
 import sys
 import os
+import multiprocessing
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                              QHBoxLayout, QPushButton, QLabel, QLineEdit,
                              QTextEdit, QProgressBar, QFileDialog, QMessageBox,
-                             QGroupBox, QCheckBox, QSpinBox, QComboBox)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer
+                             QGroupBox, QCheckBox, QSpinBox, QComboBox, QTabWidget,
+                             QTableView, QHeaderView, QAbstractItemView)
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer, QSize
 from PyQt5.QtGui import QFont, QIcon
-from PIL import Image, ImageFile
+from PIL import ImageFile
 import traceback
 import time
 
+from webp_converter_core import (find_webp_files, run_conversion, ConversionPool,
+                                 OUTPUT_FOLDER_NAME, DEFAULT_PREFETCH_MEMORY_MB,
+                                 BACKENDS, BACKEND_NAMES)
+from webp_prefetch import DEFAULT_PREFETCH_DEPTH
+from webp_metrics import MetricsRecorder, EVENTS_FILE_NAME, PROM_FILE_NAME
+from webp_admission import (WorkerPeakRss, total_peak_rss, reset_peak_rss, default_workers,
+                            DEFAULT_MEMORY_BUDGET_MB)
+from webp_layout import OutputLayout, OutputIndex, LAYOUTS, LAYOUT_NAMES
+from webp_verify import verify_outputs, STATUS_OK, STATUS_NAMES
+from webp_job_queue import JobQueuePanel
+from webp_color import COLOR_MODES, COLOR_MODE_NAMES
+from webp_autotune import tuned_options, load_profile, OBJECTIVES, OBJECTIVE_NAMES
+from webp_file_table import FileTableModel, ThumbnailCache, ThumbnailLoader, THUMBNAIL_SIZE
+
 # 允许加载大图片
 ImageFile.LOAD_TRUNCATED_IMAGES = True
 
@@ -25,19 +41,24 @@ class ConversionWorker(QThread):
     # 定义信号
     progress_updated = pyqtSignal(int, int)  # 当前进度, 总文件数
     file_converted = pyqtSignal(str, str, bool, str)  # 文件名, 状态, 是否成功, 消息
+    file_result = pyqtSignal(str, int, int, float)  # 文件名, 宽, 高, 耗时（秒）
     conversion_finished = pyqtSignal(int, int, int)  # 成功数, 跳过数, 失败数
+    conversion_tail = pyqtSignal()  # 所有文件都已提交，只剩收尾
     log_message = pyqtSignal(str)
     error_occurred = pyqtSignal(str)
 
-    def __init__(self, input_folder, output_folder, options):
+    def __init__(self, input_folder, output_folder, options, pool=None):
         super().__init__()
         self.input_folder = input_folder
         self.output_folder = output_folder
         self.options = options
+        self.pool = pool  # 共享的转换线程池（为None时单独创建）
         self._is_running = True
 
     def run(self):
         """线程主函数"""
+        metrics = None
+        index = None
         try:
             self.log_message.emit(f"开始转换，输入文件夹: {self.input_folder}")
             self.log_message.emit(f"输出文件夹: {self.output_folder}")
@@ -52,11 +73,10 @@ class ConversionWorker(QThread):
                     return
 
             # 查找所有.webp文件（不区分大小写）
-            webp_files = []
             try:
-                for filename in os.listdir(self.input_folder):
-                    if filename.lower().endswith('.webp'):
-                        webp_files.append(filename)
+                webp_files = find_webp_files(self.input_folder,
+                                             recursive=self.options.get('recursive', False),
+                                             exclude=[self.output_folder])
             except Exception as e:
                 self.error_occurred.emit(f"无法读取输入文件夹: {str(e)}")
                 return
@@ -68,15 +88,30 @@ class ConversionWorker(QThread):
 
             total_files = len(webp_files)
             self.log_message.emit(f"找到 {total_files} 个.webp文件")
+            reset_peak_rss()
 
             success_count = 0
             skip_count = 0
             fail_count = 0
 
-            # 开始转换每个文件
-            for i, filename in enumerate(webp_files, 1):
+            # 结构化指标
+            if self.options.get('events_path') or self.options.get('prom_path'):
+                metrics = MetricsRecorder(self.options.get('events_path'),
+                                          self.options.get('prom_path'),
+                                          run_info={'input_folder': self.input_folder})
+
+            # 输出布局，非平铺布局维护源→输出映射索引
+            layout = OutputLayout(self.input_folder, self.output_folder,
+                                  self.options.get('layout', 'flat'))
+            layout.plan(webp_files)
+            index = OutputIndex(self.output_folder) if layout.layout != 'flat' else None
+
+            # 检查每个文件，可转换的交给转换流程
+            jobs = []
+            sources = {}
+            processed = 0
+            for filename in webp_files:
                 if not self._is_running:
-                    self.log_message.emit("转换被用户停止")
                     break
 
                 try:
@@ -87,23 +122,29 @@ class ConversionWorker(QThread):
                     if not os.path.exists(input_path):
                         self.file_converted.emit(filename, "文件不存在", False, "")
                         fail_count += 1
+                        processed += 1
+                        if metrics:
+                            metrics.record_failure(input_path, None, "文件不存在")
                         continue
 
                     if not os.access(input_path, os.R_OK):
                         self.file_converted.emit(filename, "文件不可读", False, "")
                         fail_count += 1
+                        processed += 1
+                        if metrics:
+                            metrics.record_failure(input_path, None, "文件不可读")
                         continue
 
-                    # 生成输出文件名和路径
-                    base_name = os.path.splitext(filename)[0]
-                    png_filename = f"{base_name}.png"
-                    output_path = os.path.join(self.output_folder, png_filename)
+                    # 生成输出路径
+                    output_path = layout.output_path(filename)
 
                     # 检查是否跳过已存在文件
                     if os.path.exists(output_path) and not self.options.get('overwrite', False):
                         self.file_converted.emit(filename, "已跳过（文件已存在）", True, "")
                         skip_count += 1
-                        self.progress_updated.emit(i, total_files)
+                        processed += 1
+                        if metrics:
+                            metrics.record_skip(input_path, output_path)
                         continue
 
                     # 检查输出路径是否可写
@@ -111,29 +152,66 @@ class ConversionWorker(QThread):
                     if not os.access(output_dir, os.W_OK):
                         self.file_converted.emit(filename, "输出文件夹不可写", False, "")
                         fail_count += 1
-                        self.progress_updated.emit(i, total_files)
+                        processed += 1
+                        if metrics:
+                            metrics.record_failure(input_path, output_path, "输出文件夹不可写")
                         continue
 
-                    # 执行转换
-                    success, message = self.convert_single_file(input_path, output_path)
-
-                    if success:
-                        self.file_converted.emit(filename, "转换成功", True, message)
-                        success_count += 1
-                    else:
-                        self.file_converted.emit(filename, f"转换失败: {message}", False, "")
-                        fail_count += 1
+                    jobs.append((input_path, output_path))
+                    sources[input_path] = filename
 
                 except Exception as e:
                     error_msg = f"处理文件 {filename} 时出错: {str(e)}"
                     self.file_converted.emit(filename, error_msg, False, "")
                     fail_count += 1
+                    processed += 1
+
+            self.progress_updated.emit(processed, total_files)
+
+            # 执行转换（后台预读输入、缓冲写入输出）
+            results = run_conversion(jobs, self.options, should_stop=lambda: not self._is_running,
+                                     pool=self.pool, on_tail=self.conversion_tail.emit)
+            worker_rss = WorkerPeakRss()
+            for result in results:
+                filename = sources[result['input_path']]
+                worker_rss.add(result)
+                if metrics:
+                    metrics.record_result(result)
+                if result['success']:
+                    if index:
+                        index.add(filename, os.path.relpath(result['output_path'], self.output_folder))
+                    self.file_converted.emit(filename, "转换成功", True, result['message'])
+                    self.file_result.emit(filename, result['width'], result['height'],
+                                          sum(result['timings'].values()))
+                    success_count += 1
+                else:
+                    self.file_converted.emit(filename, f"转换失败: {result['message']}", False, "")
+                    fail_count += 1
 
                 # 更新进度
-                self.progress_updated.emit(i, total_files)
-
-                # 短暂延迟，避免UI卡顿
-                time.sleep(0.01)
+                processed += 1
+                self.progress_updated.emit(processed, total_files)
+
+            if index:
+                index.close()
+                index = None
+
+            if not self._is_running:
+                self.log_message.emit("转换被用户停止")
+            elif self.options.get('verify'):
+                self.verify_outputs(webp_files, layout)
+
+            rss = total_peak_rss(worker_rss)
+            if rss is not None:
+                workers_rss = worker_rss.total()
+                detail = f"（其中转换进程 {workers_rss / 1024 / 1024:.0f} MB）" if workers_rss else ""
+                self.log_message.emit(f"峰值内存: {rss / 1024 / 1024:.0f} MB{detail}")
+
+            if metrics:
+                summary = metrics.close()
+                self.log_message.emit(
+                    f"指标: {summary['files_per_second']} 文件/秒，用时 {summary['duration']:.2f} 秒，"
+                    f"已写入 {self.output_folder}")
 
             # 发送完成信号
             self.conversion_finished.emit(success_count, skip_count, fail_count)
@@ -141,50 +219,73 @@ class ConversionWorker(QThread):
         except Exception as e:
             self.error_occurred.emit(f"转换过程发生错误: {str(e)}")
 
-    def convert_single_file(self, input_path, output_path):
-        """转换单个文件"""
-        try:
-            # 打开图片
-            with Image.open(input_path) as img:
-                # 获取图片信息
-                img_format = img.format
-                img_mode = img.mode
-                img_size = img.size
-
-                # 转换为RGB模式（如果必要）
-                if img_mode in ('RGBA', 'LA', 'P', 'CMYK'):
-                    if img_mode == 'RGBA':
-                        # 创建一个白色背景
-                        background = Image.new('RGB', img.size, (255, 255, 255))
-                        # 合并alpha通道
-                        background.paste(img, mask=img.split()[-1])
-                        img = background
-                    else:
-                        img = img.convert('RGB')
+        finally:
+            # 出错时同样写出已记录的索引、事件和指标
+            if index:
+                index.close()
+            if metrics:
+                metrics.close()
+
+    def verify_outputs(self, webp_files, layout):
+        """校验输出文件"""
+        fraction = self.options.get('verify_sample', 1.0)
+        self.log_message.emit(f"开始校验输出{f'（抽样 {fraction:.0%}）' if fraction < 1.0 else ''}...")
+        pairs = [(os.path.join(self.input_folder, filename), layout.existing_output(filename))
+                 for filename in webp_files]
+
+        ok_count = 0
+        cached_count = 0
+        problem_count = 0
+        results = verify_outputs(pairs, self.options, self.output_folder,
+                                 should_stop=lambda: not self._is_running)
+        for result in results:
+            if result['status'] == STATUS_OK:
+                ok_count += 1
+                cached_count += result['cached']
+            else:
+                problem_count += 1
+                filename = os.path.relpath(result['input_path'], self.input_folder)
+                self.log_message.emit(
+                    f"✗ 校验失败 {filename}: {STATUS_NAMES[result['status']]} {result['message']}")
 
-                # 获取压缩级别
-                compress_level = self.options.get('compress_level', 6)
+        self.log_message.emit(f"校验完成: 一致 {ok_count}（其中 {cached_count} 个沿用上次结果），"
+                              f"问题 {problem_count}")
 
-                # 保存为PNG
-                img.save(
-                    output_path,
-                    format='PNG',
-                    compress_level=compress_level,
-                    optimize=True
-                )
+    def stop(self):
+        """停止转换"""
+        self._is_running = False
 
-            # 验证输出文件
-            if os.path.exists(output_path):
-                file_size = os.path.getsize(output_path) / 1024  # KB
-                return True, f"{img_size[0]}x{img_size[1]} ({file_size:.1f}KB)"
-            else:
-                return False, "输出文件未创建"
 
+class AutoTuneWorker(QThread):
+    """自动调优线程：在输入文件夹的样本上校准并保存结果"""
+
+    log_message = pyqtSignal(str)
+    tuned = pyqtSignal(dict)
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, input_folder, output_folder, options, objective):
+        super().__init__()
+        self.input_folder = input_folder
+        self.output_folder = output_folder
+        self.options = options
+        self.objective = objective
+        self._is_running = True
+
+    def run(self):
+        try:
+            webp_files = find_webp_files(self.input_folder,
+                                         recursive=self.options.get('recursive', False),
+                                         exclude=[self.output_folder])
+            os.makedirs(self.output_folder, exist_ok=True)
+            tuned = tuned_options(
+                self.input_folder, [os.path.join(self.input_folder, f) for f in webp_files],
+                self.options, self.objective, scratch_parent=self.output_folder, retune=True,
+                log=self.log_message.emit, should_stop=lambda: not self._is_running)
+            self.tuned.emit(tuned)
         except Exception as e:
-            return False, str(e)
+            self.error_occurred.emit(f"自动调优失败: {str(e)}")
 
     def stop(self):
-        """停止转换"""
         self._is_running = False
 
 
@@ -194,9 +295,15 @@ class WebPConverterApp(QMainWindow):
     def __init__(self):
         super().__init__()
         self.worker = None
+        self.tune_worker = None
+        self.pool = None
         self.current_folder = os.getcwd()
+        self.thumbnail_loader = ThumbnailLoader(ThumbnailCache(), parent=self)
+        self.file_model = FileTableModel(self.thumbnail_loader, self)
         self.init_ui()
         self.setup_connections()
+        self.file_model.load_folder(self.current_folder)
+        self.apply_saved_profile()
 
     def init_ui(self):
         """初始化用户界面"""
@@ -241,9 +348,17 @@ class WebPConverterApp(QMainWindow):
         # 输出文件夹名
         output_layout = QHBoxLayout()
         output_layout.addWidget(QLabel("输出文件夹名:"))
-        self.output_name_edit = QLineEdit("PNG_转换结果")
+        self.output_name_edit = QLineEdit(OUTPUT_FOLDER_NAME)
         self.output_name_edit.setFixedWidth(150)
         output_layout.addWidget(self.output_name_edit)
+        output_layout.addWidget(QLabel("输出布局:"))
+        self.layout_combo = QComboBox()
+        for name in LAYOUTS:
+            self.layout_combo.addItem(LAYOUT_NAMES[name], name)
+        self.layout_combo.setToolTip("文件很多时使用分片布局，避免单个文件夹条目过多")
+        output_layout.addWidget(self.layout_combo)
+        self.recursive_check = QCheckBox("包含子文件夹")
+        output_layout.addWidget(self.recursive_check)
         output_layout.addStretch()
         folder_layout.addLayout(output_layout)
 
@@ -268,9 +383,92 @@ class WebPConverterApp(QMainWindow):
         self.compression_combo.setToolTip("0=最快（文件大）~ 9=最慢（文件小）")
         self.compression_combo.setFixedWidth(200)
         compression_layout.addWidget(self.compression_combo)
+        self.optimize_check = QCheckBox("PNG优化")
+        self.optimize_check.setChecked(True)
+        self.optimize_check.setToolTip("开启时使用最高压缩并忽略压缩级别（文件最小，最慢）")
+        compression_layout.addWidget(self.optimize_check)
+        compression_layout.addWidget(QLabel("色彩管理:"))
+        self.color_combo = QComboBox()
+        for name in COLOR_MODES:
+            self.color_combo.addItem(COLOR_MODE_NAMES[name], name)
+        self.color_combo.setToolTip("保留: 原样写入ICC配置文件和EXIF\n"
+                                    "转换为sRGB: 按ICC配置文件转换像素，适合不做色彩管理的查看器")
+        compression_layout.addWidget(self.color_combo)
         compression_layout.addStretch()
         options_layout.addLayout(compression_layout)
 
+        # 预读设置
+        prefetch_layout = QHBoxLayout()
+        prefetch_layout.addWidget(QLabel("预读文件数:"))
+        self.prefetch_spin = QSpinBox()
+        self.prefetch_spin.setRange(1, 256)
+        self.prefetch_spin.setValue(DEFAULT_PREFETCH_DEPTH)
+        self.prefetch_spin.setToolTip("提前读入内存的文件数，网络存储或机械硬盘上可适当调大")
+        prefetch_layout.addWidget(self.prefetch_spin)
+        prefetch_layout.addWidget(QLabel("缓冲内存上限(MB):"))
+        self.prefetch_memory_spin = QSpinBox()
+        self.prefetch_memory_spin.setRange(16, 16384)
+        self.prefetch_memory_spin.setValue(DEFAULT_PREFETCH_MEMORY_MB)
+        prefetch_layout.addWidget(self.prefetch_memory_spin)
+        prefetch_layout.addStretch()
+        options_layout.addLayout(prefetch_layout)
+
+        # 并发设置
+        workers_layout = QHBoxLayout()
+        workers_layout.addWidget(QLabel("转换线程数:"))
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, 256)
+        self.workers_spin.setValue(default_workers())
+        workers_layout.addWidget(self.workers_spin)
+        workers_layout.addWidget(QLabel("解码内存预算(MB):"))
+        self.memory_budget_spin = QSpinBox()
+        self.memory_budget_spin.setRange(64, 1024 * 1024)
+        self.memory_budget_spin.setValue(DEFAULT_MEMORY_BUDGET_MB)
+        self.memory_budget_spin.setToolTip("同时解码的图片估算内存不超过该值，大图会等待内存空出后再开始")
+        workers_layout.addWidget(self.memory_budget_spin)
+        workers_layout.addWidget(QLabel("池类型:"))
+        self.backend_combo = QComboBox()
+        for name in BACKENDS:
+            self.backend_combo.addItem(BACKEND_NAMES[name], name)
+        self.backend_combo.setToolTip("线程: 无需复制数据（Pillow 解码和压缩时释放GIL）\n"
+                                      "进程: 文件数据和PNG经共享内存在进程间传递")
+        workers_layout.addWidget(self.backend_combo)
+        workers_layout.addStretch()
+        options_layout.addLayout(workers_layout)
+
+        # 自动调优
+        tune_layout = QHBoxLayout()
+        tune_layout.addWidget(QLabel("自动调优目标:"))
+        self.objective_combo = QComboBox()
+        for name in OBJECTIVES:
+            self.objective_combo.addItem(OBJECTIVE_NAMES[name], name)
+        self.objective_combo.setCurrentIndex(OBJECTIVES.index("balanced"))
+        tune_layout.addWidget(self.objective_combo)
+        self.tune_btn = QPushButton("⚙ 自动调优")
+        self.tune_btn.setToolTip("在输入文件夹的样本上校准线程数、池类型和PNG编码设置，"
+                                 "结果按本机和文件夹保存，之后选择该文件夹时自动沿用")
+        tune_layout.addWidget(self.tune_btn)
+        tune_layout.addStretch()
+        options_layout.addLayout(tune_layout)
+
+        # 输出校验
+        verify_layout = QHBoxLayout()
+        self.verify_check = QCheckBox("转换后校验输出（逐像素比较）")
+        verify_layout.addWidget(self.verify_check)
+        verify_layout.addWidget(QLabel("抽样比例(%):"))
+        self.verify_sample_spin = QSpinBox()
+        self.verify_sample_spin.setRange(1, 100)
+        self.verify_sample_spin.setValue(100)
+        self.verify_sample_spin.setToolTip("小于100时只随机抽查部分文件；未变化的文件沿用上次校验结果")
+        verify_layout.addWidget(self.verify_sample_spin)
+        verify_layout.addStretch()
+        options_layout.addLayout(verify_layout)
+
+        # 指标导出
+        self.metrics_check = QCheckBox(f"导出转换指标（{EVENTS_FILE_NAME} / {PROM_FILE_NAME}）")
+        self.metrics_check.setToolTip("在输出文件夹中写入每个文件的JSON事件和Prometheus指标文件")
+        options_layout.addWidget(self.metrics_check)
+
         options_group.setLayout(options_layout)
         main_layout.addWidget(options_group)
 
@@ -316,6 +514,11 @@ class WebPConverterApp(QMainWindow):
         self.stop_btn.setEnabled(False)
         button_layout.addWidget(self.stop_btn)
 
+        self.enqueue_btn = QPushButton("＋ 加入队列")
+        self.enqueue_btn.setFixedHeight(40)
+        self.enqueue_btn.setToolTip("以当前选项把输入文件夹加入任务队列")
+        button_layout.addWidget(self.enqueue_btn)
+
         self.open_folder_btn = QPushButton("📂 打开输出文件夹")
         self.open_folder_btn.setFixedHeight(40)
         button_layout.addWidget(self.open_folder_btn)
@@ -361,7 +564,31 @@ class WebPConverterApp(QMainWindow):
         log_layout.addLayout(log_buttons_layout)
 
         log_group.setLayout(log_layout)
-        main_layout.addWidget(log_group)
+
+        # 文件列表（按需加载行和缩略图）
+        self.file_table = QTableView()
+        self.file_table.setModel(self.file_model)
+        self.file_table.setIconSize(QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        self.file_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.file_table.setAlternatingRowColors(True)
+        self.file_table.setWordWrap(False)
+        vertical_header = self.file_table.verticalHeader()
+        vertical_header.setSectionResizeMode(QHeaderView.Fixed)
+        vertical_header.setDefaultSectionSize(THUMBNAIL_SIZE + 4)
+        vertical_header.hide()
+        horizontal_header = self.file_table.horizontalHeader()
+        horizontal_header.setSectionResizeMode(0, QHeaderView.Stretch)
+        for column in range(1, self.file_model.columnCount()):
+            horizontal_header.setSectionResizeMode(column, QHeaderView.Interactive)
+
+        self.view_tabs = QTabWidget()
+        self.view_tabs.addTab(log_group, "转换日志")
+        self.view_tabs.addTab(self.file_table, "文件列表")
+
+        # 任务队列（共用一个转换线程池）
+        self.queue_panel = JobQueuePanel(self.create_queue_worker)
+        self.view_tabs.addTab(self.queue_panel, "任务队列")
+        main_layout.addWidget(self.view_tabs)
 
         # 设置布局比例
         main_layout.setStretch(0, 0)  # 标题
@@ -370,12 +597,16 @@ class WebPConverterApp(QMainWindow):
         main_layout.setStretch(3, 0)  # 按钮
         main_layout.setStretch(4, 0)  # 进度条
         main_layout.setStretch(5, 0)  # 状态标签
-        main_layout.setStretch(6, 1)  # 日志区域（可伸缩）
+        main_layout.setStretch(6, 1)  # 日志 / 文件列表（可伸缩）
 
     def setup_connections(self):
         """设置信号和槽的连接"""
         self.browse_input_btn.clicked.connect(self.browse_input_folder)
         self.convert_btn.clicked.connect(self.start_conversion)
+        self.enqueue_btn.clicked.connect(self.enqueue_conversion)
+        self.tune_btn.clicked.connect(self.start_auto_tune)
+        self.objective_combo.currentIndexChanged.connect(lambda: self.apply_saved_profile())
+        self.queue_panel.log_message.connect(self.log_message)
         self.stop_btn.clicked.connect(self.stop_conversion)
         self.open_folder_btn.clicked.connect(self.open_output_folder)
         self.clear_log_btn.clicked.connect(self.clear_log)
@@ -391,7 +622,56 @@ class WebPConverterApp(QMainWindow):
         if folder:
             self.current_folder = folder
             self.input_path_edit.setText(folder)
+            self.file_model.load_folder(folder)
             self.log_message(f"已选择文件夹: {folder}")
+            self.apply_saved_profile()
+
+    def apply_tuned_options(self, tuned):
+        """把调优结果填入选项控件"""
+        self.workers_spin.setValue(tuned['workers'])
+        self.backend_combo.setCurrentIndex(BACKENDS.index(tuned['backend']))
+        self.compression_combo.setCurrentIndex(tuned['compress_level'])
+        self.optimize_check.setChecked(tuned['optimize'])
+
+    def apply_saved_profile(self):
+        """当前文件夹在本机有保存的调优结果时自动沿用"""
+        objective = self.objective_combo.currentData()
+        profile = load_profile(self.input_path_edit.text(), objective)
+        if profile is not None:
+            self.apply_tuned_options(profile['options'])
+            self.log_message(f"已沿用保存的调优配置（目标: {OBJECTIVE_NAMES[objective]}）")
+
+    def start_auto_tune(self):
+        """在后台校准"""
+        folders = self.get_folders()
+        if folders is None or (self.tune_worker and self.tune_worker.isRunning()):
+            return
+        input_folder, output_folder = folders
+        self.tune_worker = AutoTuneWorker(input_folder, output_folder,
+                                          self.build_options(output_folder),
+                                          self.objective_combo.currentData())
+        self.tune_worker.log_message.connect(self.log_message)
+        self.tune_worker.tuned.connect(self.handle_tuned)
+        self.tune_worker.error_occurred.connect(self.handle_tune_error)
+        self.tune_btn.setEnabled(False)
+        self.tune_btn.setText("校准中...")
+        self.view_tabs.setCurrentIndex(0)
+        self.tune_worker.start()
+
+    def _tune_done(self):
+        self.tune_worker.wait()
+        self.tune_worker = None
+        self.tune_btn.setEnabled(True)
+        self.tune_btn.setText("⚙ 自动调优")
+
+    def handle_tuned(self, tuned):
+        self.apply_tuned_options(tuned)
+        self._tune_done()
+        self.log_message("自动调优完成，已更新转换选项")
+
+    def handle_tune_error(self, error_message):
+        self._tune_done()
+        self.log_message(f"❌ {error_message}")
 
     def log_message(self, message):
         """添加日志消息"""
@@ -413,35 +693,99 @@ class WebPConverterApp(QMainWindow):
         clipboard.setText(self.log_text.toPlainText())
         self.log_message("日志已复制到剪贴板")
 
-    def start_conversion(self):
-        """开始转换"""
+    def get_folders(self):
+        """检查并返回 (输入文件夹, 输出文件夹)，无效时提示并返回None"""
         # 检查输入文件夹
         input_folder = self.input_path_edit.text()
         if not input_folder or not os.path.exists(input_folder):
             QMessageBox.warning(self, "警告", "请输入有效的输入文件夹路径！")
-            return
+            return None
 
         # 检查输出文件夹名
         output_folder_name = self.output_name_edit.text().strip()
         if not output_folder_name:
             QMessageBox.warning(self, "警告", "请输入输出文件夹名！")
-            return
+            return None
 
         # 构建输出文件夹路径
-        output_folder = os.path.join(input_folder, output_folder_name)
+        return input_folder, os.path.join(input_folder, output_folder_name)
 
-        # 准备选项
+    def build_options(self, output_folder):
+        """根据界面设置生成转换选项"""
         options = {
             'overwrite': self.overwrite_check.isChecked(),
-            'compress_level': self.compression_combo.currentIndex()
+            'compress_level': self.compression_combo.currentIndex(),
+            'optimize': self.optimize_check.isChecked(),
+            'flatten_alpha': True,
+            'color_mode': self.color_combo.currentData(),
+            'prefetch_depth': self.prefetch_spin.value(),
+            'prefetch_memory_mb': self.prefetch_memory_spin.value(),
+            'layout': self.layout_combo.currentData(),
+            'recursive': self.recursive_check.isChecked(),
+            'verify': self.verify_check.isChecked(),
+            'verify_sample': self.verify_sample_spin.value() / 100,
+            'workers': self.workers_spin.value(),
+            'backend': self.backend_combo.currentData(),
+            'memory_budget_mb': self.memory_budget_spin.value()
         }
+        if self.metrics_check.isChecked():
+            options['events_path'] = os.path.join(output_folder, EVENTS_FILE_NAME)
+            options['prom_path'] = os.path.join(output_folder, PROM_FILE_NAME)
+        return options
+
+    def get_pool(self, options):
+        """
+        返回共享的转换池
+        线程数、池类型或内存预算改变时，在没有任务运行的情况下重新创建；
+        转换进程意外退出导致池损坏时立即重新创建（仍在使用旧池的任务会各自失败）
+        """
+        busy = (self.worker and self.worker.isRunning()) or self.queue_panel.is_busy()
+        if (self.pool is None or self.pool.broken
+                or (not busy and not self.pool.matches(options))):
+            if self.pool is not None:
+                self.pool.shutdown(wait=False)
+            self.pool = ConversionPool.from_options(options)
+        return self.pool
+
+    def create_queue_worker(self, input_folder, output_folder, options):
+        """为队列任务创建共用线程池的工作线程"""
+        return ConversionWorker(input_folder, output_folder, options, pool=self.get_pool(options))
+
+    def enqueue_conversion(self):
+        """把当前输入文件夹和选项加入任务队列"""
+        folders = self.get_folders()
+        if folders is None:
+            return
+        input_folder, output_folder = folders
+        self.queue_panel.enqueue(input_folder, output_folder, self.build_options(output_folder))
+        self.view_tabs.setCurrentWidget(self.queue_panel)
+
+    def start_conversion(self):
+        """开始转换"""
+        folders = self.get_folders()
+        if folders is None:
+            return
+        input_folder, output_folder = folders
+
+        # 准备选项
+        options = self.build_options(output_folder)
+
+        # 文件列表切换到当前输入文件夹
+        if self.file_model.folder != input_folder:
+            self.file_model.load_folder(input_folder)
+        else:
+            self.file_model.reset_status()
 
         # 创建并启动工作线程
-        self.worker = ConversionWorker(input_folder, output_folder, options)
+        self.worker = ConversionWorker(input_folder, output_folder, options,
+                                       pool=self.get_pool(options))
 
         # 连接信号
         self.worker.progress_updated.connect(self.update_progress)
         self.worker.file_converted.connect(self.handle_file_converted)
+        self.worker.file_converted.connect(
+            lambda filename, status, success, _: self.file_model.set_status(filename, status, success))
+        self.worker.file_result.connect(self.file_model.set_result)
         self.worker.conversion_finished.connect(self.handle_conversion_finished)
         self.worker.log_message.connect(self.log_message)
         self.worker.error_occurred.connect(self.handle_error)
@@ -464,7 +808,8 @@ class WebPConverterApp(QMainWindow):
         self.log_message(f"输入文件夹: {input_folder}")
         self.log_message(f"输出文件夹: {output_folder}")
         self.log_message(f"覆盖模式: {'是' if options['overwrite'] else '否'}")
-        self.log_message(f"压缩级别: {options['compress_level']}")
+        self.log_message(f"压缩级别: {'优化（最高）' if options['optimize'] else options['compress_level']}")
+        self.log_message(f"转换池: {options['workers']} 个{BACKEND_NAMES[options['backend']]}")
         self.log_message("=" * 50)
 
     def stop_conversion(self):
@@ -578,7 +923,8 @@ class WebPConverterApp(QMainWindow):
 
     def closeEvent(self, event):
         """窗口关闭事件"""
-        if self.worker and self.worker.isRunning():
+        worker_busy = self.worker and self.worker.isRunning()
+        if worker_busy or self.queue_panel.is_busy():
             reply = QMessageBox.question(
                 self,
                 "确认退出",
@@ -588,14 +934,25 @@ class WebPConverterApp(QMainWindow):
             )
 
             if reply == QMessageBox.Yes:
-                self.worker.stop()
-                self.worker.wait(2000)  # 等待2秒让线程结束
+                if worker_busy:
+                    self.worker.stop()
+                    self.worker.wait(2000)  # 等待2秒让线程结束
+                self.queue_panel.stop_queue()
+                for job in self.queue_panel.active_jobs():
+                    job.worker.wait(2000)
                 event.accept()
             else:
                 event.ignore()
+                return
         else:
             event.accept()
 
+        if self.tune_worker and self.tune_worker.isRunning():
+            self.tune_worker.stop()
+            self.tune_worker.wait(2000)
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+
 
 def main():
     """主函数"""
@@ -616,6 +973,9 @@ def main():
 
 
 if __name__ == "__main__":
+    # 打包为exe时进程池的子进程需要
+    multiprocessing.freeze_support()
+
     # 检查Pillow是否支持WebP
     try:
         from PIL import features
@@ -0,0 +1,237 @@
+"""
+输出校验
+逐对解码源WebP和输出PNG，按转换时相同的色彩管理和透明通道处理得到期望图像，再逐像素比较。
+- 比较使用 ImageChops.difference 在C层整体完成，不逐像素循环
+- 多个文件在线程池中并行校验（Pillow 解码和像素运算时释放GIL）；
+  与转换相同，按图片头估算每对文件的峰值内存，只有在内存预算内放得下时才开始校验
+- 结果缓存在输出文件夹的校验清单中，源和输出都未变化的文件不再重复校验
+- 支持按比例抽样的快速模式
+"""
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from PIL import Image, ImageChops
+
+from webp_converter_core import process_image
+from webp_admission import (MemoryAdmission, AdmissionQueue, estimate_peak_memory,
+                            default_workers, MB, DEFAULT_MEMORY_BUDGET_MB)
+
+MANIFEST_FILE_NAME = "verify_manifest.tsv"
+
+# 校验结果
+STATUS_OK = "ok"
+STATUS_MISMATCH = "mismatch"
+STATUS_MISSING = "missing"
+STATUS_CORRUPT = "corrupt"
+STATUS_ERROR = "error"
+
+STATUS_NAMES = {
+    STATUS_OK: "一致",
+    STATUS_MISMATCH: "像素不一致",
+    STATUS_MISSING: "输出缺失",
+    STATUS_CORRUPT: "输出损坏",
+    STATUS_ERROR: "源文件无法解码",
+}
+
+
+def _signature(input_path, output_path, options):
+    """源与输出的文件签名（大小、修改时间）及影响期望图像的选项"""
+    src = os.stat(input_path)
+    out = os.stat(output_path)
+    flatten = int(bool(options.get('flatten_alpha', False)))
+    color_mode = options.get('color_mode', 'keep')
+    return (f"{src.st_size}:{src.st_mtime_ns}:{out.st_size}:{out.st_mtime_ns}:{flatten}"
+            f":{color_mode}")
+
+
+class VerifyManifest:
+    """
+    校验清单（追加写入的TSV）：源路径 \\t 签名 \\t 结果
+    只有签名一致且结果为一致的记录才会被视为已校验
+    """
+
+    def __init__(self, output_folder):
+        self.path = os.path.join(output_folder, MANIFEST_FILE_NAME)
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._file = None
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    parts = line.rstrip('\n').split('\t')
+                    if len(parts) == 3:
+                        self._entries[parts[0]] = (parts[1], parts[2])
+        except OSError:
+            pass
+
+    def is_verified(self, input_path, signature):
+        return self._entries.get(input_path) == (signature, STATUS_OK)
+
+    def record(self, input_path, signature, status):
+        with self._lock:
+            if self._entries.get(input_path) == (signature, status):
+                return
+            self._entries[input_path] = (signature, status)
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8', newline='\n')
+            self._file.write(f"{input_path}\t{signature}\t{status}\n")
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def _load_strict(path):
+    """完整解码图片；截断或损坏的文件会抛出异常（不受 LOAD_TRUNCATED_IMAGES 影响）"""
+    with Image.open(path) as img:
+        # verify 会检查PNG各数据块的CRC直到IEND
+        img.verify()
+    img = Image.open(path)
+    img.load()
+    return img
+
+
+def verify_pair(input_path, output_path, options):
+    """
+    校验一对源/输出文件
+    返回 (结果, 说明)
+    """
+    if not os.path.exists(output_path):
+        return STATUS_MISSING, "输出文件不存在"
+
+    try:
+        output = _load_strict(output_path)
+    except Exception as e:
+        return STATUS_CORRUPT, str(e)
+
+    try:
+        with Image.open(input_path) as source:
+            source.load()
+            expected, _ = process_image(source, options)
+            if expected is source:
+                expected = source.copy()
+    except Exception as e:
+        output.close()
+        return STATUS_ERROR, str(e)
+
+    with output:
+        if output.size != expected.size:
+            return STATUS_MISMATCH, f"尺寸不同: {output.size} ≠ {expected.size}"
+        actual = output if output.mode == expected.mode else output.convert(expected.mode)
+        if expected.mode not in ('L', 'RGB', 'RGBA', 'LA'):
+            expected = expected.convert('RGBA')
+            actual = actual.convert('RGBA')
+
+        # 整幅图像求差，再取各通道的最大差值
+        extrema = ImageChops.difference(expected, actual).getextrema()
+        if isinstance(extrema[0], int):
+            extrema = (extrema,)
+        max_diff = max(high for _, high in extrema)
+
+    if max_diff > options.get('verify_tolerance', 0):
+        return STATUS_MISMATCH, f"最大像素差 {max_diff}"
+    return STATUS_OK, ""
+
+
+def estimate_verify_memory(input_path, options):
+    """
+    按源文件头估算校验一对文件的峰值内存（字节）
+    转换时的估算（解码、处理副本、输入数据）+ 解码的输出 + 模式转换副本 + 差值图像
+    源文件无法打开时返回0（校验会立即以“源文件无法解码”结束）
+    """
+    try:
+        with Image.open(input_path) as img:
+            width, height, mode = img.width, img.height, img.mode
+        input_size = os.path.getsize(input_path)
+    except Exception:
+        return 0
+    return estimate_peak_memory(width, height, mode, input_size, options) + width * height * 4 * 3
+
+
+def verify_outputs(pairs, options, output_folder, should_stop=None):
+    """
+    并行校验 (输入路径, 输出路径) 列表，按完成顺序产出结果字典：
+    input_path, output_path, status, message, cached
+    选项: verify_sample（抽样比例，0~1）、verify_workers、verify_tolerance、
+    memory_budget_mb（同时校验的内存预算，与转换相同）
+    清单中已校验的文件直接产出；其余逐个估算内存，在预算内才提交，同时进行的校验不超过线程数
+    """
+    pairs = list(pairs)
+    fraction = options.get('verify_sample', 1.0)
+    if fraction < 1.0:
+        count = max(1, round(len(pairs) * fraction)) if pairs else 0
+        pairs = random.Random(options.get('verify_seed')).sample(pairs, count)
+
+    manifest = VerifyManifest(output_folder)
+    workers = options.get('verify_workers') or default_workers()
+    admission = MemoryAdmission(options.get('memory_budget_mb', DEFAULT_MEMORY_BUDGET_MB) * MB)
+    waiting = AdmissionQueue(admission)
+    running = {}  # Future -> (估算字节数, (输入路径, 输出路径, 签名))
+    remaining = iter(pairs)
+    exhausted = False
+
+    def stop_requested():
+        return bool(should_stop and should_stop())
+
+    def check(input_path, output_path, signature):
+        status, message = verify_pair(input_path, output_path, options)
+        if signature:
+            manifest.record(input_path, signature, status)
+        return status, message
+
+    def result(input_path, output_path, status, message, cached):
+        return {
+            'input_path': input_path,
+            'output_path': output_path,
+            'status': status,
+            'message': message,
+            'cached': cached,
+        }
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='verify')
+    try:
+        while True:
+            # 清单中已校验的文件直接产出，其余估算内存后排队（排队数有上限）
+            while not exhausted and len(waiting) < workers * 2 and not stop_requested():
+                pair = next(remaining, None)
+                if pair is None:
+                    exhausted = True
+                    break
+                input_path, output_path = pair
+                try:
+                    signature = _signature(input_path, output_path, options)
+                except OSError:
+                    signature = None
+                if signature and manifest.is_verified(input_path, signature):
+                    yield result(input_path, output_path, STATUS_OK, "", True)
+                    continue
+                waiting.add(estimate_verify_memory(input_path, options),
+                            (input_path, output_path, signature))
+
+            if stop_requested():
+                waiting.pop_all()
+                break
+
+            for cost, job in waiting.pop_admitted(workers - len(running)):
+                running[executor.submit(check, *job)] = (cost, job)
+
+            if not running:
+                if not len(waiting) and exhausted:
+                    break
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                cost, (input_path, output_path, _) = running.pop(future)
+                admission.release(cost)
+                status, message = future.result()
+                yield result(input_path, output_path, status, message, False)
+    finally:
+        for future in running:
+            future.cancel()
+        executor.shutdown(wait=True)
+        manifest.close()